@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from process import sgml_split, detect, html_parse, handle_tables, numbers, toc_extract, text_clean, headings, chunker, dedup
+from tests.clean_reference import chop_off_graphics, clean_reference  # the old clean_text, to check text_clean against
+
+# Times each pipeline stage on the checked-in AWK sample (or a synthetic corpus from
+# make_synthetic_corpus.py) and saves the numbers as JSON, so two commits can be compared:
+#
+#   python benchmark.py                               all stages on the AWK sample
+#   python benchmark.py --stages clean_text,clean_html --repeats 5
+#   python benchmark.py --corpus synthetic-filings    every filing in a corpus
+#   python benchmark.py --compare old.json new.json
+#
+# Every stage runs in its own fresh process, so its peak RSS isn't mixed up with
+# what the stages before it left behind. Setup (reading, parsing inputs) isn't timed.
+SAMPLE = "target_sample_AWK_040650.html"
+RESULTS_DIR = "bench_results"
+REPEATS = 3
+
+
+def _raw(path):
+    return sgml_split.read_documents(path)
+
+
+def _text(path):
+    return html_parse.stream_html(_raw(path))
+
+
+def _size(data):
+    return len(data.encode("utf-8")) if isinstance(data, str) else os.path.getsize(data)
+
+
+def _check_clean_text(raw):
+    # The compiled passes must give exactly what the old clean_text gave
+    # (graphics are cut off by sgml_split now, not by clean_text)
+    return text_clean.clean(chop_off_graphics(raw)) == clean_reference(raw)
+
+
+# name -> (setup: path -> input, run: input -> anything, check: input -> bool or None)
+STAGES = {
+    "detect": (lambda path: path, detect.detect_format, None),
+    "sgml_split": (lambda path: path, sgml_split.read_documents, None),
+    "clean_html": (_raw, html_parse.clean_html, None),
+    "stream_html": (lambda path: path, lambda path: html_parse.stream_html(sgml_split.iter_chunks(path)), None),
+    "extract_tables": (_raw, handle_tables.extract_tables, None),
+    "normalize_numbers": (lambda path: handle_tables.extract_tables(_raw(path)), numbers.normalize_tables, None),
+    "find_table_of_contents": (_raw, lambda raw: toc_extract.find_table_of_contents(raw, "bench"), None),
+    "clean_text": (_raw, text_clean.clean, _check_clean_text),
+    "section_spans": (_text, headings.section_spans, None),
+    "chunker": (_text, lambda text: chunker.plan_batches(text, 12000), None),
+    "dedup_signatures": (_text, lambda text: [dedup.signature(paragraph) for paragraph in dedup.paragraphs(text)], None),
+}
+
+
+def _input_bytes(name, path, data):
+    if name == "normalize_numbers":
+        return sum(len(str(value)) for df in data for value in df.to_numpy().ravel())
+    if name in ("detect", "sgml_split", "stream_html"):
+        return os.path.getsize(path)
+    return _size(data)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if platform.system() == "Darwin" else peak / 1024
+
+
+def run_stage(name, paths, repeats):
+    """Runs in a fresh process: set up every input, then time `repeats` passes over all of them."""
+    setup, run, check = STAGES[name]
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))  # stages that write debug files write them here
+
+    inputs = [setup(path) for path in paths]
+    size = sum(_input_bytes(name, path, data) for path, data in zip(paths, inputs))
+    rss_before = _peak_rss_mb()
+
+    walls, cpus = [], []
+    for _ in range(repeats):
+        wall, cpu = time.perf_counter(), time.process_time()
+        for data in inputs:
+            run(data)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    median = statistics.median(walls)
+    result = {
+        "files": len(paths),
+        "bytes": size,
+        "wall_s": walls,
+        "median_s": median,
+        "min_s": min(walls),
+        "cpu_s": statistics.median(cpus),
+        "mb_per_s": size / 1024 ** 2 / median if median else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "setup_rss_mb": rss_before,
+    }
+    if check is not None:
+        result["check"] = all(check(data) for data in inputs)
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(paths, stages, repeats=REPEATS):
+    results = {
+        "commit": _commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} cpus",
+        "inputs": [os.path.abspath(path) for path in paths] if len(paths) <= 10 else f"{len(paths)} filings",
+        "input_bytes": sum(os.path.getsize(path) for path in paths),
+        "repeats": repeats,
+        "stages": {},
+    }
+    paths = [os.path.abspath(path) for path in paths]
+    spawn = multiprocessing.get_context("spawn")
+    for name in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            stage = pool.submit(run_stage, name, paths, repeats).result()
+        results["stages"][name] = stage
+
+        check = "" if "check" not in stage else (" ✅ same output as the reference" if stage["check"] else " ❌ output differs from the reference")
+        print(f"⏱️ {name:24} {stage['median_s']:8.3f}s  {stage['mb_per_s'] or 0:8.2f} MB/s  peak RSS {stage['peak_rss_mb']:7.1f} MB{check}")
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    if old.get("input_bytes") != new.get("input_bytes") or old.get("inputs") != new.get("inputs"):
+        print("⚠️ The two runs used different inputs, compare MB/s rather than seconds.")
+    print(f"{'stage':24} {old.get('commit') or 'old':>10} {new.get('commit') or 'new':>10}   change   peak RSS")
+    for name, stage in new["stages"].items():
+        before = old["stages"].get(name)
+        if before is None:
+            print(f"{name:24} {'-':>10} {stage['median_s']:9.3f}s")
+            continue
+        change = stage["median_s"] / before["median_s"] - 1 if before["median_s"] else 0.0
+        flag = "🐢" if change > 0.1 else "🚀" if change < -0.1 else "  "
+        print(
+            f"{name:24} {before['median_s']:9.3f}s {stage['median_s']:9.3f}s {change:+7.1%} {flag} "
+            f"{before['peak_rss_mb']:6.0f} -> {stage['peak_rss_mb']:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the 10-K pipeline")
+    parser.add_argument("--input", default=SAMPLE, help="one full-submission file (default: the AWK sample)")
+    parser.add_argument("--corpus", help="directory to search for full-submission.txt files instead of --input")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma separated, default: all")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--out", help=f"JSON results file (default: {RESULTS_DIR}/<time>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    if args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "**", "full-submission.txt"), recursive=True))
+        if not paths:
+            sys.exit(f"❌ No full-submission.txt under {args.corpus}")
+    else:
+        paths = [args.input]
+
+    stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        sys.exit(f"❌ Unknown stages: {', '.join(unknown)} (have: {', '.join(STAGES)})")
+
+    results = benchmark(paths, stages, args.repeats)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{results['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"✅ Results saved to {out}")
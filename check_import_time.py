@@ -0,0 +1,27 @@
+# Measures how long a fresh worker process takes to import the pipeline.
+# Nothing here should touch the network or load a model, so it has to fit in
+# models.IMPORT_BUDGET_MS. Run it after adding imports to any stage.
+import sys
+from process import models
+
+MODULES = [
+    "process.sgml_split",
+    "process.detect",
+    "process.html_parse",
+    "process.toc_extract",
+    "process.handle_tables",
+    "process.nlp_extract",
+    "process.cleanup",
+    "main",
+]
+
+if __name__ == "__main__":
+    over = False
+    for module in MODULES:
+        ms = models.import_time_ms(module)
+        flag = "✅" if ms <= models.IMPORT_BUDGET_MS else "❌"
+        over = over or ms > models.IMPORT_BUDGET_MS
+        print(f"{flag} {module}: {ms:.0f} ms")
+
+    print(f"\nBudget: {models.IMPORT_BUDGET_MS} ms per module")
+    sys.exit(1 if over else 0)
@@ -1,16 +1,11 @@
 import os
 import platform
 import re
-import spacy
-import nltk
+import shutil
 from tqdm import tqdm
-from nltk.tokenize import sent_tokenize
+from process import sgml_split, text_clean, stage_cache, token_store, shard_writer
+from process.models import sent_tokenize  # checks the local punkt data on first use, no download at start
 # from concurrent.futures import ProcessPoolExecutor
-nltk.download('punkt')
-nltk.download('punkt_tab')
-
-# Load NLP Model
-nlp = spacy.load("en_core_web_sm")
 
 # Define Parent Input and Output Folder Paths
 PARENT_INPUT_FOLDER = "sec-edgar-filings"
@@ -18,6 +13,23 @@ PARENT_OUTPUT_FOLDER = "cleaned_10k_reports"
 
 missing_log_file = os.path.join(PARENT_OUTPUT_FOLDER, "missing_toc.log")
 success_log_file = os.path.join(PARENT_OUTPUT_FOLDER, "success_toc.log")
+
+# Reruns reuse cleaned sections for filings whose text hasn't changed.
+# Bump CLEAN_VERSION whenever clean_filing's output changes.
+CLEAN_VERSION = 1
+CACHE = stage_cache.StageCache()
+
+# Also write every section as uint32 token IDs to a memory-mapped store for training
+# (see process/token_store.py). The cleaned text is already lowercased and squeezed,
+# so tokens are just the whitespace-split words.
+WRITE_TOKENS = False
+
+# "txt" writes two loose files per filing (body + toc_ copy). "jsonl.zst" or "parquet"
+# batch every filing's sections into size-bounded shards under SHARD_FOLDER instead,
+# with a manifest (see process/shard_writer.py), which is what big runs should use.
+OUTPUT_FORMAT = "txt"
+SHARD_FOLDER = os.path.join(PARENT_OUTPUT_FOLDER, "shards")
+
 # todo:
 # I'm trying to get the key sections from the table of contents.
 # because chunking seems to not be working how I want, need more customized sections
@@ -38,78 +50,10 @@ def get_toc(text):
         return [title,b[0]]
     return [title + b[1],b[0]]
 
-def chop_off_graphics(text):
-    return re.split(r'\bGRAPHIC\b',text, maxsplit=1)[0]
-
 # Cleans 10-K text by removing unwanted characters, metadata, and formatting noise.
+# The rules live in process/text_clean.py, compiled once into a few combined passes.
 def clean_text(text):
-    text = chop_off_graphics(text)
-    text = text.lower()  # Convert to lowercase
-    text = re.sub(r'<.*?>', ' ', text)  # Remove HTML/SGML tags
-    text = re.sub(r'[^a-zA-Z0-9.,;?!\s]', '', text) # Remove special characters EXCEPT basic punctuation
-    text = re.sub(r'nbsp;','',text) # remove inline 'nbsp;'
-
-    text = re.sub(r'stylefontsize','',text) # remove more inline stuff
-    text = re.sub(r'fontsize','',text) # remove more inline stuff
-
-    text = re.sub(r'stylemargintop','',text) # remove more inline stuff
-    text = re.sub(r'margintop','',text) # remove more inline stuff
-
-    text = re.sub(r'stylemarginbottom','',text) # remove more inline stuff
-    text = re.sub(r'marginbottom','',text) # remove more inline stuff
-
-    text = re.sub(r'stylelineheight','',text) # remove more inline stuff
-    text = re.sub(r'lineheight','',text) # remove more inline stuff
-
-
-    text = re.sub(r'styleborderbottom','',text) # remove more inline stuff
-    text = re.sub(r'borderbottom','',text) # remove more inline stuff
-
-    text = re.sub(r'textindent','',text) # remove more inline stuff
-
-    text = re.sub(r'stylealigncenter','',text) # remove more inline stuff
-    text = re.sub(r'aligncenter','',text) # remove more inline stuff
-
-    text = re.sub(r'stylealignleft','',text) # remove more inline stuff
-    text = re.sub(r'alignleft','',text) # remove more inline stuff
-
-    text = re.sub(r'stylealignright','',text) # remove more inline stuff
-    text = re.sub(r'alignright','',text) # remove more inline stuff
-
-    text = re.sub(r'times','',text) # remove more inline stuff
-
-    text = re.sub(r'stylefont face','',text) # remove more inline stuff
-    text = re.sub(r'font face','',text) # remove more inline stuff
-
-    text = re.sub(r'times new roman','',text) # remove more inline stuff
-
-    text = re.sub(r'size\d','',text) # remove more inline stuff
-
-
-
-
-    text = re.sub(r'\b\d+px\b','',text) #remove pixel things 
-    text = re.sub(r'\b\d+pt\b','',text) #remove point things
-
-    text = re.sub(r'146;','\'',text) #remove point things
-    text = re.sub(r'147;','"',text) #remove point things
-    text = re.sub(r'148;','"',text) #remove point things
-    text = re.sub(r'149;','-',text) #remove point things
-
-
-    text = re.sub(r';','.',text) # turn ';' into '.'
-    text = re.sub(r'\sp\s\.','',text) #remove floating p's
-    text = re.sub(r'\s+\.','.',text) #remove spaces before '.'
-    text = re.sub(r'\.\.+','.',text) # remove extra trailing '.'
-
-
-
-    # text = re.sub
-    text = re.sub(r'begin privacyenhanced message.*?dkhtm', '', text, flags=re.DOTALL)  # Remove SEC metadata blocks
-    text = re.sub(r'(accession number|standard industrial classification|file number).*?\n', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'[\n]+', '\n', text)  # Normalize line breaks
-    text = re.sub(r'\s+', ' ', text)  # Remove extra spaces
-    return text
+    return text_clean.clean(text)
 
 # Splits text into sections based on common 10-K headers.
 def chunk_text(text):
@@ -145,19 +89,61 @@ def account_for_system(relative_path):
         return rel[0] + "_" + rel[2] +".txt"
 
 
+# Cleans one filing and splits it into sentence-tokenized sections, for the toc (if any) and the body
+def clean_filing(text):
+    # here we want to extract the toc for later use
+    items = get_toc(text)
+
+    t_sections = None
+    if items[1]:
+        toc = clean_text(items[1])
+        t_sections = chunk_text(toc)
+        # 4: Tokenize sentences
+        for section, content in t_sections.items():
+            t_sections[section] = " ".join(sent_tokenize(content))
+
+    # 2: Clean the text
+    text = clean_text(items[0])
+    # 3: Split into sections
+    sections = chunk_text(text)
+
+    # 4: Tokenize sentences
+    for section, content in sections.items():
+        sections[section] = " ".join(sent_tokenize(content))
+
+    return t_sections, sections
+
+
+def section_records(sections, t_sections):
+    """One record per section with the toc's text for the same section, toc-only sections get empty text."""
+    t_sections = t_sections or {}
+    records = [{"section": section, "text": content, "toc": t_sections.get(section)} for section, content in sections.items()]
+    records += [{"section": section, "text": "", "toc": content} for section, content in t_sections.items() if section not in sections]
+    return records
+
+
+def write_sections(path, sections):
+    with open(path, "w", encoding="utf-8") as f:
+        for section, content in sections.items():
+            f.write(f"\n\n### {section.upper()} ###\n{content}\n")
+
+
 # Walk through all subdirectories in input folder
 if __name__ == "__main__":
     # Ensure output folder exists
     os.makedirs(PARENT_OUTPUT_FOLDER, exist_ok=True)
 
-    # Remove old processed files before starting
-    if os.path.exists(PARENT_OUTPUT_FOLDER):
-        print("🗑️ Deleting old processed files...")
-        for root, dirs, files in os.walk(PARENT_OUTPUT_FOLDER, topdown=False):
-            for file in files:
-                os.remove(os.path.join(root, file))
-            for dir in dirs:
-                os.rmdir(os.path.join(root, dir))
+    # Old outputs are kept, unchanged filings come straight out of the stage cache.
+    # Only the logs start fresh.
+    for log_file in (missing_log_file, success_log_file):
+        open(log_file, "w", encoding="utf-8").close()
+
+    # Shards start over though, a ShardWriter on the old folder would append every filing again
+    if OUTPUT_FORMAT != "txt":
+        shutil.rmtree(SHARD_FOLDER, ignore_errors=True)
+
+    tokens = token_store.TokenStoreWriter() if WRITE_TOKENS else None
+    shards = shard_writer.ShardWriter(SHARD_FOLDER, OUTPUT_FORMAT) if OUTPUT_FORMAT != "txt" else None
 
     # write
     for root, _, files in os.walk(PARENT_INPUT_FOLDER):
@@ -172,47 +158,37 @@ if __name__ == "__main__":
                 # we're writing two things for now, this is temporary
                 output_path = os.path.join(PARENT_OUTPUT_FOLDER, write_name)
 
-                with open(input_path, "r", encoding="utf-8") as f:
-                    text = f.read()
-
-                # here we want to extract the toc for later use
-                items = get_toc(text)
-
-                if items[1]:
-                    # start toc processing
-                    toc_output_path = os.path.join(PARENT_OUTPUT_FOLDER, "toc_" + write_name)
-                    toc = clean_text(items[1])
-                    t_sections = chunk_text(toc)
-                    # 4: Tokenize sentences
-                    for section, content in t_sections.items():
-                        t_sections[section] = " ".join(sent_tokenize(content))
-                    # 5: Save to output file
-                    with open(toc_output_path, "w", encoding="utf-8") as f:
-                        for section, content in t_sections.items():
-                            f.write(f"\n\n### {section.upper()} ###\n{content}\n")
-                    # end toc processing
+                # only the main 10-K (and EX-13) documents, graphics and other exhibits are never decoded
+                text = sgml_split.read_documents(input_path)
+
+                t_sections, sections = CACHE.run("clean", CLEAN_VERSION, text, lambda: clean_filing(text))
+
+                if t_sections is not None:
+                    # 5: Save toc to output file
+                    if shards is None:
+                        write_sections(os.path.join(PARENT_OUTPUT_FOLDER, "toc_" + write_name), t_sections)
                     with open(success_log_file, "a", encoding="utf-8") as log:
                         log.write(output_path + "\n")
                 else:
                     with open(missing_log_file, "a", encoding="utf-8") as log:
                         log.write(output_path + "\n")
 
+                ticker, _, filing_id = relative_path.replace("\\", "/").split("/", 2)
 
+                # 5: Save to output file, or to the current shard
+                if shards is None:
+                    write_sections(output_path, sections)
+                else:
+                    shards.add_filing(ticker, filing_id, section_records(sections, t_sections))
 
-                # resume text processing
-                # 2: Clean the text
-                text = clean_text(items[0])
-                # 3: Split into sections
-                sections = chunk_text(text)
-
-                # 4: Tokenize sentences
-                for section, content in sections.items():
-                    sections[section] = " ".join(sent_tokenize(content))
-
-                # 5: Save to output file
-                with open(output_path, "w", encoding="utf-8") as f:
-                    for section, content in sections.items():
-                        f.write(f"\n\n### {section.upper()} ###\n{content}\n")
+                if tokens is not None:
+                    # Skipped when the store already has this filing from the same text and CLEAN_VERSION
+                    source = f"{CLEAN_VERSION}:{stage_cache.digest(text)}"
+                    tokens.add_sections(ticker, filing_id, {section: content.split() for section, content in sections.items()}, source=source)
 
+    if tokens is not None:
+        tokens.close()
+    if shards is not None:
+        shards.close()
 
     print(f"✅ Processing complete! Cleaned files saved in {PARENT_OUTPUT_FOLDER}")
@@ -0,0 +1 @@
+# Lets pytest import the pipeline modules (process/...) from tests/ without installing anything.
@@ -1,17 +1,18 @@
 import os
+import sys
 import json
-import openai
 import time
-import concurrent.futures
-from bs4 import BeautifulSoup
-from threading import Semaphore
+import shutil
+import asyncio
+import argparse
 from tqdm import tqdm  # ✅ Progress bar
 from dotenv import load_dotenv
+from process.llm_cache import LLMCache
+from process.llm_client import LLMClient
+from process import chunker, dedup, shard_writer, result_log, partition
 
 load_dotenv()
 
-client = openai.OpenAI(api_key=OPEN_AI_API_KEY)
-
 # Base directory where your SEC filings are stored
 BASE_DIR = "sec-edgar-filings"
 
@@ -20,11 +21,36 @@ OUTPUT_DIR = "gpt_process"
 
 # OpenAI API parameters
 MODEL = "gpt-3.5-turbo"  # ✅ Cheaper model
-CHUNK_SIZE = 4000
-BATCH_SIZE = 3  # ✅ Group chunks into batches for fewer API calls
-MAX_RETRIES = 3  # ✅ Retries on API failure
-MAX_THREADS = 3  # ✅ Controls parallel processing
-API_SEMAPHORE = Semaphore(2)  # ✅ Prevents excessive API calls
+CHUNK_TOKENS = 1000  # ✅ Chunks end on a section/paragraph/sentence boundary at or under this
+SKIP_REPEATED = True  # ✅ Only text that changed since the ticker's prior filing goes to the model
+CONTEXT_TOKENS = 16385  # ✅ gpt-3.5-turbo context window
+RESPONSE_TOKENS = 4096  # ✅ Room left for the answer
+MAX_RETRIES = 6  # ✅ Retries on 429/5xx, with jittered backoff or the server's Retry-After
+# ✅ One scheduler for the whole run: requests go out as fast as these limits allow
+RPM = 3500  # requests per minute for the account
+TPM = 90000  # tokens per minute for the account
+MAX_IN_FLIGHT = 16  # requests waiting on the API at once
+MAX_FILINGS = 8  # filings read into memory at once, doesn't affect the request rate
+SYSTEM_PROMPT = "Extract relevant sections and format them into structured JSON."
+
+# ✅ Batches are packed to fill the context window (minus prompt and answer) with as few calls as possible
+COUNT_TOKENS = chunker.token_counter(MODEL)
+BATCH_TOKENS = CONTEXT_TOKENS - RESPONSE_TOKENS - COUNT_TOKENS(SYSTEM_PROMPT) - 16
+
+# ✅ Responses are cached on disk by model + prompt + chunk text, reruns only pay for what changed
+CACHE = LLMCache()
+
+# ✅ "json" writes one file per filing, "jsonl.zst" or "parquet" batch the filings into
+# size-bounded shards with a manifest instead (see process/shard_writer.py)
+OUTPUT_FORMAT = "json"
+SHARD_DIR = os.path.join(OUTPUT_DIR, "shards")
+SHARDS = None  # the open shard writer while a sharded run is going
+
+# ✅ Every finished batch is appended to this log right away (fsynced in groups), so a crash
+# only loses what was in flight: a rerun skips the logged batches. RESUME = False starts over.
+RESULT_LOG = os.path.join(OUTPUT_DIR, "log", "results.jsonl")
+RESUME = True
+RESULTS = None  # the open result log while a run is going
 
 def delete_existing_files():
     """Deletes all existing files in gpt_process before starting."""
@@ -33,6 +59,9 @@ def delete_existing_files():
             file_path = os.path.join(OUTPUT_DIR, file)
             if os.path.isfile(file_path):
                 os.remove(file_path)
+        shutil.rmtree(SHARD_DIR, ignore_errors=True)  # ✅ Shards start over too
+        if not RESUME and os.path.exists(RESULT_LOG):
+            os.remove(RESULT_LOG)
     else:
         os.makedirs(OUTPUT_DIR)  # ✅ Ensure directory exists
     print("🗑️ Deleted all previous files in gpt_process.\n")
@@ -49,121 +78,142 @@ def find_filing_files(base_dir):
                     filing_files.append((ticker, filing_id, os.path.join(root, file)))
     return filing_files
 
-def detect_html(content):
-    """Check if a file contains HTML tags."""
-    return "<html" in content.lower() or "<body" in content.lower()
+def read_file_in_chunks(file_path, chunk_tokens=CHUNK_TOKENS, ticker=None, filing_id=None):
+    """Generator that reads a file in token-budgeted chunks, cut on text boundaries, and processes HTML if needed.
 
-def extract_text_from_html(content):
-    """Extract meaningful text from HTML content."""
-    soup = BeautifulSoup(content, "html.parser")
-    return soup.get_text(separator="\n", strip=True)
+    With ticker/filing_id given, paragraphs repeated from the ticker's prior filing are left out.
+    """
+    content = dedup.read_filing_text(file_path)
 
-def read_file_in_chunks(file_path, chunk_size=CHUNK_SIZE):
-    """Generator that reads a file in chunks and processes HTML if needed."""
-    with open(file_path, "r", encoding="utf-8") as file:
-        content = file.read().strip()
-    
-    if detect_html(content):
-        content = extract_text_from_html(content)
+    if SKIP_REPEATED and ticker:
+        content, dropped = dedup.drop_repeated(ticker, filing_id, content)
+        if dropped:
+            print(f"♻️ {ticker}-{filing_id}: skipped {dropped} paragraphs repeated from the prior filing")
     
-    for i in range(0, len(content), chunk_size):
-        yield content[i:i + chunk_size]
-
-def process_batch(batch):
-    """Send a batch of text chunks to OpenAI for processing with rate limiting."""
-    for attempt in range(MAX_RETRIES):
-        try:
-            with API_SEMAPHORE:  # ✅ Limit concurrent API calls
-                time.sleep(2)  # ✅ Prevent hitting rate limits
-
-                response = client.chat.completions.create(
-                    model=MODEL,
-                    messages=[{"role": "system", "content": "Extract relevant sections and format them into structured JSON."}] +
-                              [{"role": "user", "content": chunk} for chunk in batch]
-                )
-
-                response_text = "\n\n".join([choice.message.content.strip() for choice in response.choices])
-                if not response_text:
-                    raise ValueError("Empty response from OpenAI API")
-
-                return response_text  # ✅ Return combined raw text
-
-        except openai.RateLimitError:
-            wait_time = (2 ** attempt) * 5  # ✅ Exponential backoff
-            print(f"⚠️ Rate limit exceeded. Retrying in {wait_time} seconds...")
-            time.sleep(wait_time)
-
-        except Exception as e:
-            print(f"⚠️ OpenAI API error: {e}")
-
-    print("❌ Max retries reached. Skipping this batch.")
-    return ""
-
-def load_existing_content(output_filename):
-    """Loads existing content from a JSON file if it exists."""
-    if os.path.exists(output_filename):
-        with open(output_filename, "r", encoding="utf-8") as file:
-            try:
-                data = json.load(file)
-                return data.get("full_text", "")  # ✅ Preserve previous content
-            except json.JSONDecodeError:
-                print(f"⚠️ Warning: {output_filename} is corrupted. Creating a new file.")
-                return ""
-    return ""
-
-def process_single_filing(ticker, filing_id, file_path, progress_bar):
-    """Processes a single SEC filing with rate-limited API requests and a progress bar."""
+    yield from chunker.split_text(content, chunk_tokens, COUNT_TOKENS)
+
+def read_batches(file_path, ticker=None, filing_id=None):
+    """The filing's chunks packed into batches for the model."""
+    chunks = list(read_file_in_chunks(file_path, ticker=ticker, filing_id=filing_id))
+    # ✅ First-fit decreasing into near-full context windows, batches keep their chunks in document order
+    packed = chunker.pack([COUNT_TOKENS(chunk) for chunk in chunks], BATCH_TOKENS)
+    return [[chunks[i] for i in indices] for indices in packed]
+
+async def process_batch(client, batch):
+    """Send a batch of text chunks to OpenAI, unless the same batch was already answered for this model and prompt."""
+    key = "\0".join(batch)
+    response_text = CACHE.get(MODEL, SYSTEM_PROMPT, key)
+    if response_text is not None:
+        return response_text
+
+    response_text = await client.chat(
+        [{"role": "system", "content": SYSTEM_PROMPT}] + [{"role": "user", "content": chunk} for chunk in batch],
+        max_tokens=RESPONSE_TOKENS,
+    )
+    if response_text:
+        CACHE.put(MODEL, SYSTEM_PROMPT, key, response_text)
+    return response_text  # ✅ "" when the retries ran out
+
+async def process_single_filing(client, ticker, filing_id, file_path, progress_bar):
+    """Processes a single SEC filing, its batches scheduled on the shared client."""
     progress_bar.set_description(f"Processing {ticker}-{filing_id}")
     output_filename = os.path.join(OUTPUT_DIR, f"{ticker}_{filing_id}.json")
 
-    existing_content = load_existing_content(output_filename)  # ✅ Load previous data
-    combined_text = existing_content  # ✅ Append to existing content
-
-    batch = []  # ✅ Store batch chunks
-    chunks = list(read_file_in_chunks(file_path))  # ✅ Get total chunks for progress tracking
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        futures = []
-        for i, chunk in enumerate(tqdm(chunks, desc=f"Processing {ticker}-{filing_id}", leave=False)):
-            batch.append(chunk)
-            if len(batch) >= BATCH_SIZE:
-                futures.append(executor.submit(process_batch, batch[:]))
-                batch = []  # ✅ Reset batch
-
-        if batch:
-            futures.append(executor.submit(process_batch, batch))
-
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result:
-                combined_text += result + "\n\n"  # ✅ Append new content
-
-    # ✅ Save appended results
-    with open(output_filename, "w", encoding="utf-8") as output_file:
-        json.dump({"ticker": ticker, "filing_id": filing_id, "full_text": combined_text}, output_file, indent=4)
+    # ✅ Parsing, dedup and token counting are CPU work: a thread keeps the other filings' requests going meanwhile
+    batches = await asyncio.to_thread(read_batches, file_path, ticker, filing_id)
+
+    async def run_batch(index, batch):
+        prompt = result_log.prompt_hash(MODEL, SYSTEM_PROMPT, *batch)
+        if RESULTS.get(ticker, filing_id, index, prompt) is not None:
+            return True  # ✅ Logged by an earlier run
+        response = await process_batch(client, batch)
+        if response:  # ✅ "" (retries ran out) isn't logged, the next run tries again
+            RESULTS.append(ticker, filing_id, index, prompt, response)
+        return bool(response)
+
+    # ✅ All batches go out at once, the client decides when each one is actually sent
+    logged = await asyncio.gather(*(run_batch(index, batch) for index, batch in enumerate(batches)))
+    # ✅ Put together from the log in batch order (batches are in order of their first chunk)
+    combined_text = RESULTS.assemble(ticker, filing_id, range(len(batches)))
+
+    if SHARDS is not None:
+        SHARDS.add_filing(ticker, filing_id, [{"section": "full_text", "text": combined_text}])
+    else:
+        with open(output_filename, "w", encoding="utf-8") as output_file:
+            json.dump({"ticker": ticker, "filing_id": filing_id, "full_text": combined_text}, output_file, indent=4)
 
     progress_bar.update(1)  # ✅ Update progress bar
-    print(f"✅ Saved {output_filename} (Appended)")
+    print(f"✅ Saved {output_filename}")
+    return logged.count(False)  # ✅ Batches still missing
+
+async def process_filings_async(filings, previous, shards=1):
+    """Runs every filing against one shared, rate limited client. Returns [(ticker, filing_id, error)]."""
+    filing_slots = asyncio.Semaphore(MAX_FILINGS)
+    done = []
+
+    # ✅ The account limits are shared by every shard
+    async with LLMClient(MODEL, rpm=RPM / shards, tpm=TPM / shards, max_in_flight=MAX_IN_FLIGHT, max_retries=MAX_RETRIES) as client:
+        with tqdm(total=len(filings), desc="Overall Progress") as progress_bar:
+
+            async def run_ticker(ticker_filings):
+                # ✅ A ticker's filings go in date order, each one is compared against the one before
+                for ticker, filing_id, file_path in ticker_filings:
+                    async with filing_slots:
+                        try:
+                            if SKIP_REPEATED:
+                                # ✅ The prior filing may belong to another shard, index it here if it isn't yet
+                                await asyncio.to_thread(dedup.index_prior, ticker, filing_id, previous)
+                            missing = await process_single_filing(client, ticker, filing_id, file_path, progress_bar)
+                            done.append((ticker, filing_id, f"{missing} batches failed" if missing else None))
+                        except Exception as e:
+                            print(f"❌ Error processing {ticker} {filing_id}: {e}")
+                            done.append((ticker, filing_id, str(e)))
+
+            await asyncio.gather(*(run_ticker(ticker_filings) for ticker_filings in dedup.group_by_ticker(filings)))
+        client.report()
+    return done
+
+def process_filings(shard=None):
+    """Process all filings with controlled concurrency and a progress bar.
+
+    With shard=(i, N) only the filings whose accession hashes to shard i, into their own partition of OUTPUT_DIR.
+    """
+    global OUTPUT_DIR, SHARD_DIR, RESULT_LOG, SHARDS, RESULTS
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if shard is not None:
+        # ✅ Everything this shard writes (JSONs, shards, result log) goes into its own partition
+        OUTPUT_DIR = partition.partition_dir(OUTPUT_DIR, shard)
+        SHARD_DIR = os.path.join(OUTPUT_DIR, "shards")
+        RESULT_LOG = os.path.join(OUTPUT_DIR, "log", "results.jsonl")
 
-def process_filings():
-    """Process all filings with controlled concurrency and a progress bar."""
     delete_existing_files()  # ✅ Delete all files before starting
-    filings = find_filing_files(BASE_DIR)
-
-    print(f"🔄 Processing {len(filings)} filings...\n")
-
-    with tqdm(total=len(filings), desc="Overall Progress") as progress_bar:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-            futures = {executor.submit(process_single_filing, ticker, filing_id, file_path, progress_bar): (ticker, filing_id) for ticker, filing_id, file_path in filings}
-
-            for future in concurrent.futures.as_completed(futures):
-                ticker, filing_id = futures[future]
-                try:
-                    future.result()  # ✅ Wait for completion
-                except Exception as e:
-                    print(f"❌ Error processing {ticker} {filing_id}: {e}")
+    all_filings = find_filing_files(BASE_DIR)
+    filings = [filing for filing in all_filings if partition.owns(filing[1], shard)]
+    if OUTPUT_FORMAT != "json":
+        SHARDS = shard_writer.ShardWriter(SHARD_DIR, OUTPUT_FORMAT)
+    RESULTS = result_log.ResultLog(RESULT_LOG)
+
+    print(f"🔄 Processing {len(filings)} filings{f' (shard {shard[0]}/{shard[1]})' if shard else ''}...\n")
+    done = asyncio.run(process_filings_async(filings, dedup.previous_filings(all_filings), shard[1] if shard else 1))
+    RESULTS.close()
+    if SHARDS is not None:
+        SHARDS.close()  # ✅ Commits the last shard
+    if shard is not None:
+        partition.write_manifest(OUTPUT_DIR, shard, done, started=started, base_dir=os.path.abspath(BASE_DIR))
 
     print("\n✅ All filings processed!")
+    CACHE.report()
 
 # Run the optimized processing function
-process_filings()
+#   python gpt_process.py               every filing
+#   python gpt_process.py --shard 0/4   shard 0 of 4, run the others on other boxes (or side by side)
+#   python gpt_process.py --merge 4     check the 4 shards together processed every filing once
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize 10-K filings with the OpenAI API")
+    parser.add_argument("--shard", help="i/N: only the filings whose accession hashes to shard i of N (i from 0)")
+    parser.add_argument("--merge", type=int, metavar="N", help="merge and verify the manifests of an N-shard run")
+    args = parser.parse_args()
+
+    if args.merge:
+        sys.exit(0 if partition.merge(OUTPUT_DIR, [filing[:2] for filing in find_filing_files(BASE_DIR)], args.merge) else 1)
+    process_filings(partition.parse(args.shard) if args.shard else None)
@@ -1,6 +1,6 @@
 # Final Pipeline Overview
 
-#     Detect format (detect_format())
+#     Detect each main document's format (sgml_split.document_formats())
 #     Extract & clean:
 #         HTML → clean_html()
 #         Plaintext → normalize_text()
@@ -10,69 +10,123 @@
 #         Remove stopwords
 #         Apply lemmatization (optional)
 import os
-import threading
-from pathlib import Path
-from process import detect, html_parse, nlp_extract, handle_tables, conv_plaintext, cleanup, toc_extract
+import sys
+import time
+import argparse
+from process import html_parse, conv_plaintext, toc_extract, sgml_split, orchestrate, stage_cache, document, metrics, partition
 
 # Define input/output directories
 INPUT_DIR = "sec-edgar-filings"
 OUTPUT_DIR = "cleaned_10k_reports"
 
+# Process pool settings
+WORKERS = orchestrate.DEFAULT_WORKERS
+ORDERED_RESULTS = False  # True to get results back in filing order
+
+# "soup" builds a full BeautifulSoup tree, "stream" feeds the mapped filing through
+# html.parser in ~1 MB chunks so memory stays flat on 20-100 MB filings
+HTML_MODE = "soup"
+
 # Ensure output directory exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Stage outputs are cached by input hash + stage version, so reruns only redo what changed
+CACHE = stage_cache.StageCache()
+
+# Per-stage wall/CPU time, sizes and memory go to metrics/stages.jsonl (None to turn off),
+# see metrics_summary.py for p50/p95/p99 and the slowest filings
+METRICS_PATH = metrics.METRICS_PATH
+METRICS_SNAPSHOT_EVERY = 100  # refresh the Prometheus snapshot every N finished filings
+
 # Process a single report file
-def process_report(file_path, ticker, filing_id):
+def process_report(file_path, ticker, filing_id, html_mode=HTML_MODE, output_dir=OUTPUT_DIR, metrics_path=METRICS_PATH):
+    stages = metrics.FilingMetrics(ticker, filing_id, metrics_path)
+    input_size = os.path.getsize(file_path) if os.path.exists(file_path) else None
     try:
-        # Step 1: Read file contents
-        with open(file_path, "r", encoding="utf-8") as f:
-            raw_content = f.read()
+        # Step 1: Find the main documents in the SGML envelope and sniff each one's format from its
+        # first few KB. Exhibits and graphics are skipped, so is a main document filed as PDF/XBRL/uuencode.
+        formats = stages.run("detect", lambda: sgml_split.document_formats(file_path), bytes_in=input_size)
+        html_docs = any(fmt in sgml_split.HTML_FORMATS for fmt in formats)  # inline XBRL is still XHTML
+        text_docs = "text" in formats
+        if not (html_docs or text_docs):
+            raise ValueError(f"no readable main document (formats: {', '.join(formats) or 'none'})")
 
         # Name and set output for the processed report as {ticker}_{ID}.txt
         output_filename = f"{ticker}_{filing_id}.txt"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-
-        # Step 2: Detect format (HTML or plaintext)
-        file_type = detect.detect_format(file_path)
-
-        # Step 3: Process based on type
-        if file_type == "html":
-            processed_text = html_parse.clean_html(raw_content)
+        output_path = os.path.join(output_dir, output_filename)
+
+        # Step 2: Read each format's documents for its own step below.
+        # In stream mode the HTML ones are read chunk by chunk in step 3 instead.
+        raw_content = None
+        if html_docs and html_mode != "stream":
+            raw_content = stages.run("read_documents", lambda: sgml_split.read_documents(file_path, formats=sgml_split.HTML_FORMATS), bytes_in=input_size)
+        plain_content = None
+        if text_docs:
+            plain_content = stages.run("read_text_documents", lambda: sgml_split.read_documents(file_path, formats=("text",)), bytes_in=input_size)
+
+        # Parsed at most once (and only on a cache miss), then shared by every stage below
+        filing = document.ParsedFiling(raw_content, output_filename) if raw_content is not None else None
+
+        # Step 3: HTML documents go through the HTML cleaner, plaintext ones (older filings) through normalize_text
+        parts = []
+        if html_docs and html_mode == "stream":
+            file_hash = stages.run("file_digest", lambda: stage_cache.file_digest(file_path), bytes_in=input_size)
+            parts.append(stages.run("html_stream", lambda: CACHE.run("html_stream", html_parse.VERSION, file_hash, lambda: html_parse.stream_html(sgml_split.iter_chunks(file_path, formats=sgml_split.HTML_FORMATS))), bytes_in=input_size))
+        elif html_docs:
+            parts.append(stages.run("html_parse", lambda: CACHE.run("html_parse", html_parse.VERSION, raw_content, lambda: html_parse.clean_html(filing)), bytes_in=len(raw_content)))
+        if text_docs:
+            parts.append(stages.run("conv_plaintext", lambda: CACHE.run("conv_plaintext", conv_plaintext.VERSION, plain_content, lambda: conv_plaintext.normalize_text(plain_content)), bytes_in=len(plain_content)))
+        processed_text = "\n".join(parts)
+
+        # debug step extract tocs, from the parsed filing when we have one
+        if filing is not None:
+            toc_source, toc_key = filing, raw_content
         else:
-            processed_text = conv_plaintext.normalize_text(raw_content)
-
-        # debug step extract tocs
-        toc_extract.find_table_of_contents(processed_text,output_filename)
+            toc_source, toc_key = processed_text, processed_text
+        stages.run("toc_extract", lambda: CACHE.run("toc_extract", toc_extract.VERSION, toc_key, lambda: toc_extract.find_table_of_contents(toc_source,output_filename)), bytes_in=len(toc_key))
 
         # # Step 4: Extract meaningful sections (e.g., Risk Factors, MD&A)
-        # sections = nlp_extract.extract_sections(processed_text,output_filename)
+        # from process import nlp_extract
+        # sections = nlp_extract.extract_sections(filing,output_filename)
+        # tokens = nlp_extract.tokenize_sections(sections, output_filename)  # tokenizer only, see NLP_EXCLUDE
 
         # # Step 5: Extract financial tables (if HTML)
-        # if file_type == "html":
-        #     tables = handle_tables.extract_tables(raw_content)
+        # if filing is not None:
+        #     from process import handle_tables
+        #     tables_path = os.path.join(output_dir, f"{ticker}_{filing_id}_tables.parquet")  # all tables in one file for ML
+        #     tables = stages.run("handle_tables", lambda: CACHE.run("handle_tables", handle_tables.VERSION, raw_content, lambda: handle_tables.extract_tables(filing, parquet_path=tables_path)), bytes_in=len(raw_content))
+        #     from process import numbers  # pulls in pandas, only when tables are on
+        #     numeric_tables = stages.run("numbers", lambda: CACHE.run("numbers", numbers.VERSION, raw_content, lambda: numbers.normalize_tables(tables)), bytes_in=len(tables))
 
         # # Step 6: Cleanup and final text processing
-        # cleaned_text = cleanup.remove_stopwords(processed_text)
+        # from process import cleanup
+        # cleaned_text = stages.run("cleanup", lambda: CACHE.run("cleanup", cleanup.VERSION, processed_text, lambda: cleanup.remove_stopwords(processed_text)), bytes_in=len(processed_text))
 
 
         # with open(output_path, "w", encoding="utf-8") as f:
         #     f.write(cleaned_text)
 
         # print(f"✔ Processed {output_filename}")
+        stages.finish(bytes_in=input_size)
+        return ticker, filing_id, None
 
     except Exception as e:
         print(f"❌ Error processing {ticker}/{filing_id}: {e}")
+        stages.finish(bytes_in=input_size, error=str(e))
+        return ticker, filing_id, str(e)
 
 
+def warm_worker():
+    """Loads the models the active stages need once per worker, before its first filing.
+    Steps 1-3 use neither spaCy nor NLTK, so right now there is nothing to load."""
+    # with Step 4 on, load the pruned model here (from process import models, nlp_extract):
+    # models.get_nlp(exclude=nlp_extract.NLP_EXCLUDE)
+    # with Step 6 on, the stop words:
+    # models.get_stop_words()
 
-def process_all_reports():
-    threads = []
-    count = 0
-    print(f"Scanning directory: {INPUT_DIR}")
-    if not os.path.exists(INPUT_DIR):
-        print(f"❌ ERROR: Input directory {INPUT_DIR} does not exist.")
-        return
 
+def find_reports():
+    """Yields (file_path, ticker, filing_id) for every full-submission.txt under INPUT_DIR."""
     for ticker in os.listdir(INPUT_DIR):
         ticker_path = os.path.join(INPUT_DIR, ticker, "10-K")  # Updated path
         print(f"Checking ticker folder: {ticker_path}")
@@ -82,24 +136,84 @@ def process_all_reports():
                 filing_path = os.path.join(ticker_path, filing_id, "full-submission.txt")  # Corrected path
 
                 if os.path.exists(filing_path):
-                    count += 1
-                    print(f"=> {count}, {filing_path}")
-                    thread = threading.Thread(target=process_report, args=(filing_path, ticker, filing_id))
-                    threads.append(thread)
-                    thread.start()
+                    yield filing_path, ticker, filing_id
 
-                    # Limit concurrent threads to avoid resource exhaustion
-                    if len(threads) >= 10:
-                        for t in threads:
-                            t.join()
-                        threads = []
 
-    for t in threads:
-        t.join()
+def shard_path(path, shard):
+    """metrics/stages.jsonl -> metrics/stages.shard-001-of-004.jsonl, so shards never share a file."""
+    if not path or shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{partition.name(shard)}{ext}"
 
-    print("✅ All reports processed!")
+
+def process_all_reports(shard=None):
+    """Processes every filing under INPUT_DIR, or with shard=(i, N) only the ones whose
+    accession hashes to shard i, into that shard's own partition of OUTPUT_DIR."""
+    print(f"Scanning directory: {INPUT_DIR}")
+    if not os.path.exists(INPUT_DIR):
+        print(f"❌ ERROR: Input directory {INPUT_DIR} does not exist.")
+        return False
+
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    output_dir = partition.partition_dir(OUTPUT_DIR, shard)
+    os.makedirs(output_dir, exist_ok=True)
+    metrics_path = shard_path(METRICS_PATH, shard)
+    # The snapshot is refreshed from what was appended since the last one, not the whole file
+    totals = metrics.StageTotals(metrics_path)
+
+    jobs = [
+        (file_path, ticker, filing_id, HTML_MODE, output_dir, metrics_path)
+        for file_path, ticker, filing_id in find_reports()
+        if partition.owns(filing_id, shard)
+    ]
+    where = f" (shard {shard[0]}/{shard[1]}, output in {output_dir})" if shard else ""
+    print(f"🔄 Processing {len(jobs)} reports on {WORKERS} workers{where}...")
+
+    # Every worker pulls the next filing as soon as it is free
+    failed = 0
+    done = []
+    results = orchestrate.run_jobs(process_report, jobs, workers=WORKERS, warmup=warm_worker, ordered=ORDERED_RESULTS)
+    try:
+        for count, (ticker, filing_id, error) in enumerate(results, start=1):
+            if error:
+                failed += 1
+            done.append((ticker, filing_id, error))
+            print(f"=> {count}/{len(jobs)}, {ticker}/{filing_id}")
+            if metrics_path and count % METRICS_SNAPSHOT_EVERY == 0:
+                metrics.prometheus_snapshot(metrics_path, shard_path(metrics.PROMETHEUS_PATH, shard), totals)
+    except orchestrate.WarmupError as e:
+        # A model the stages need is missing (e.g. HTML_TOKENIZER_OFFLINE=1 without the NLTK data)
+        print(f"❌ ERROR: {e}")
+        return False
+
+    if shard is not None:
+        # Written last, so a shard that died has no manifest and the merge says so
+        partition.write_manifest(output_dir, shard, done, started=started, input_dir=os.path.abspath(INPUT_DIR))
+
+    print(f"✅ All reports processed! ({failed} failed)")
+    if metrics_path:
+        metrics.prometheus_snapshot(metrics_path, shard_path(metrics.PROMETHEUS_PATH, shard), totals)
+        print(f"📊 Stage metrics in {metrics_path}, run python metrics_summary.py --path {metrics_path} for the breakdown")
+    return True
+
+
+def merge_shards(count):
+    """Checks an N-shard run: every filing under INPUT_DIR processed once, by its own shard."""
+    expected = [(ticker, filing_id) for _, ticker, filing_id in find_reports()]
+    return partition.merge(OUTPUT_DIR, expected, count)
 
 
 # Run the pipeline
+#   python main.py                  everything, in one process pool
+#   python main.py --shard 1/4      only shard 1 of 4 (run 0/4 .. 3/4 on different boxes, or side by side)
+#   python main.py --merge 4        combine the 4 shard manifests and check nothing is missing
 if __name__ == "__main__":
-    process_all_reports()
+    parser = argparse.ArgumentParser(description="Clean every 10-K filing under " + INPUT_DIR)
+    parser.add_argument("--shard", help="i/N: only the filings whose accession hashes to shard i of N (i from 0)")
+    parser.add_argument("--merge", type=int, metavar="N", help="merge and verify the manifests of an N-shard run")
+    args = parser.parse_args()
+
+    if args.merge:
+        sys.exit(0 if merge_shards(args.merge) else 1)
+    sys.exit(0 if process_all_reports(partition.parse(args.shard) if args.shard else None) else 1)
@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import random
+import binascii
+from process import sgml_split
+
+# Builds a fake sec-edgar-filings/ tree of N full-submission.txt files out of the
+# AWK sample, to measure how the pipeline scales:
+#
+#   python make_synthetic_corpus.py N [out_dir] [seed]
+#
+# Main 10-K documents get lognormal sizes around the size real 10-Ks have, made of
+# the sample's own paragraphs and tables. Each filing gets a random mix of the
+# sample's exhibits, uuencoded GRAPHIC blobs, and now and then an EX-13 or XBRL instance.
+SAMPLE = "target_sample_AWK_040650.html"
+OUT_DIR = "synthetic-filings"
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE", "FFF", "GGG", "HHH"]
+
+MAIN_MEDIAN_BYTES = 1.5 * 1024 ** 2
+MAIN_SIGMA = 0.8  # lognormal spread: most between ~0.5 and ~5 MB
+MAIN_MIN_BYTES = 100 * 1024
+MAIN_MAX_BYTES = 30 * 1024 ** 2
+GRAPHICS = (0, 12)  # how many uuencoded images per filing
+GRAPHIC_BYTES = (5 * 1024, 150 * 1024)
+EX13_SHARE = 0.15  # older filings put the annual report in an EX-13
+XBRL_SHARE = 0.3
+
+BLOCK_END = re.compile(r"(?i)(?<=</p>)|(?<=</table>)|(?<=</div>)")
+
+
+def load_sample(path=SAMPLE):
+    """(blocks of the main 10-K's HTML body, exhibit documents) from the sample."""
+    main, exhibits = None, []
+    for doc in sgml_split.iter_documents(path, types=None):
+        if doc["type"] == "10-K":
+            main = doc
+        elif doc["format"] == "html":
+            exhibits.append(doc)
+
+    body = re.split(r"(?i)<body[^>]*>", main["text"], maxsplit=1)[-1]
+    body = re.split(r"(?i)</body>", body, maxsplit=1)[0]
+    blocks = [block for block in BLOCK_END.split(body) if block.strip()]
+    return blocks, exhibits
+
+
+def main_document(blocks, size, rng):
+    """A 10-K of about size bytes: runs of consecutive sample blocks, so tables and
+    paragraphs stay whole and in a realistic order."""
+    parts, total = [], 0
+    while total < size:
+        start = rng.randrange(len(blocks))
+        for block in blocks[start:start + rng.randint(20, 200)]:
+            parts.append(block)
+            total += len(block)
+            if total >= size:
+                break
+    return "<HTML><HEAD><TITLE>Form 10-K</TITLE></HEAD>\n<BODY>\n" + "".join(parts) + "\n</BODY></HTML>\n"
+
+
+def uuencode(name, data):
+    lines = [f"begin 644 {name}"]
+    for i in range(0, len(data), 45):
+        lines.append(binascii.b2a_uu(data[i:i + 45]).decode("ascii").rstrip("\n"))
+    lines += ["`", "end"]
+    return "\n".join(lines) + "\n"
+
+
+def xbrl_instance(rng):
+    facts = "".join(
+        f'<us-gaap:Revenues contextRef="FY{year}" unitRef="USD" decimals="-3">{rng.randint(10 ** 5, 10 ** 9)}</us-gaap:Revenues>\n'
+        for year in range(2000, 2000 + rng.randint(5, 40))
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<xbrl xmlns="http://www.xbrl.org/2003/instance" xmlns:us-gaap="http://fasb.org/us-gaap/2008-03-31">\n'
+        f"{facts}</xbrl>\n"
+    )
+
+
+def document(doc_type, sequence, filename, description, text):
+    return (
+        f"<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{sequence}\n<FILENAME>{filename}\n"
+        f"<DESCRIPTION>{description}\n<TEXT>\n{text}</TEXT>\n</DOCUMENT>\n"
+    )
+
+
+def filing(accession, blocks, exhibits, rng):
+    size = min(MAIN_MAX_BYTES, max(MAIN_MIN_BYTES, rng.lognormvariate(0, MAIN_SIGMA) * MAIN_MEDIAN_BYTES))
+    docs = []
+    if rng.random() < EX13_SHARE:
+        # Short 10-K wrapper, the bulk of the text lives in the EX-13
+        docs.append(("10-K", "d10k.htm", "FORM 10-K", main_document(blocks, size * 0.1, rng)))
+        docs.append(("EX-13", "dex13.htm", "ANNUAL REPORT", main_document(blocks, size * 0.9, rng)))
+    else:
+        docs.append(("10-K", "d10k.htm", "FORM 10-K", main_document(blocks, size, rng)))
+
+    for exhibit in rng.sample(exhibits, rng.randint(0, len(exhibits))):
+        docs.append((exhibit["type"], exhibit["filename"], exhibit["description"] or "", exhibit["text"]))
+    if rng.random() < XBRL_SHARE:
+        docs.append(("EX-101.INS", "instance.xml", "XBRL INSTANCE DOCUMENT", xbrl_instance(rng)))
+    for i in range(rng.randint(*GRAPHICS)):
+        name = f"g{i:04d}.jpg"
+        docs.append(("GRAPHIC", name, "GRAPHIC", uuencode(name, rng.randbytes(rng.randint(*GRAPHIC_BYTES)))))
+
+    header = (
+        f"<SEC-DOCUMENT>{accession}.txt\n<SEC-HEADER>{accession}.hdr.sgml\n"
+        f"ACCESSION NUMBER:\t\t{accession}\nCONFORMED SUBMISSION TYPE:\t10-K\n"
+        f"PUBLIC DOCUMENT COUNT:\t\t{len(docs)}\n</SEC-HEADER>\n"
+    )
+    body = "".join(document(doc_type, i, name, description, text) for i, (doc_type, name, description, text) in enumerate(docs, 1))
+    return header + body + "</SEC-DOCUMENT>\n"
+
+
+def make_corpus(count, out_dir=OUT_DIR, seed=0, sample=SAMPLE):
+    """Writes count filings under out_dir/sec-edgar-filings and returns their paths."""
+    rng = random.Random(seed)
+    blocks, exhibits = load_sample(sample)
+    paths = []
+    for n in range(count):
+        ticker = TICKERS[n % len(TICKERS)]
+        year = 1 + n // len(TICKERS)  # consecutive years per ticker
+        accession = f"{rng.randint(1, 10 ** 10 - 1):010d}-{year % 100:02d}-{rng.randint(1, 999999):06d}"
+        path = os.path.join(out_dir, "sec-edgar-filings", ticker, "10-K", accession, "full-submission.txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(filing(accession, blocks, exhibits, rng))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else OUT_DIR
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    paths = make_corpus(count, out_dir, seed)
+    total = sum(os.path.getsize(path) for path in paths)
+    print(f"✅ {len(paths)} filings, {total / 1024 ** 2:.1f} MB in {out_dir}/sec-edgar-filings")
@@ -0,0 +1,20 @@
+import sys
+import argparse
+from process import metrics
+
+# Where did the time go in the last run? Reads the per-stage metrics main.py writes:
+#
+#   python metrics_summary.py                    p50/p95/p99 per stage + 10 slowest filings
+#   python metrics_summary.py --top 25 --path metrics/stages.jsonl
+#   python metrics_summary.py --prometheus       (re)write the Prometheus snapshot and print it
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage timing summary of a pipeline run")
+    parser.add_argument("--path", default=metrics.METRICS_PATH, help=f"metrics JSONL (default: {metrics.METRICS_PATH})")
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest filings to list")
+    parser.add_argument("--prometheus", action="store_true", help=f"write {metrics.PROMETHEUS_PATH} and print it instead")
+    args = parser.parse_args()
+
+    if args.prometheus:
+        sys.stdout.write(metrics.prometheus_snapshot(args.path))
+    else:
+        print(metrics.summary(args.path, args.top))
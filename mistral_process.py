@@ -1,20 +1,26 @@
 import os
+import sys
 import json
 import time
+import shutil
+import argparse
 import concurrent.futures
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 from llama_cpp import Llama  # ✅ Local AI Model (No API)
+from process.llm_cache import LLMCache
+from process import chunker, dedup, shard_writer, result_log, partition
+from process.llm_worker import InferenceWorker, PROMPT_TEMPLATE
 
 # Load the Mistral model
 # wget https://huggingface.co/TheBloke/Mistral-7B-Instruct-v0.1-GGUF/resolve/main/mistral-7b-instruct.Q6_K.gguf -O mistral-7b.gguf
 
 MODEL_PATH = "mistral-7b-instruct.Q6_K_M.gguf"
+CONTEXT_TOKENS = 4096
 
 # MODEL_PATH = "mistral-7b.gguf"
 llm = Llama(
         model_path=MODEL_PATH, 
-        n_ctx=4096,
+        n_ctx=CONTEXT_TOKENS,
         n_threads=8,
         n_gpu_layers=0
     )  # ✅ Fully local, uses GPU if available
@@ -23,10 +29,41 @@ llm = Llama(
 BASE_DIR = "sec-edgar-filings"
 OUTPUT_DIR = "mistral_process"  # ✅ Changed from 'gpt_process' to 'mistral_process'
 
-CHUNK_SIZE = 4000
-BATCH_SIZE = 3
+CHUNK_TOKENS = 1000  # ✅ Chunks end on a section/paragraph/sentence boundary at or under this
+SKIP_REPEATED = True  # ✅ Only text that changed since the ticker's prior filing goes to the model
 MAX_RETRIES = 3
-MAX_THREADS = 3
+MAX_THREADS = 3  # ✅ Filings read and chunked at once, the model itself only runs in WORKER
+MAX_TOKENS = 500
+INSTRUCTION = "Extract relevant sections and structure into JSON."
+
+# ✅ The only thing that touches llm: prompts queue up here, instruction first, so the
+# instruction's KV cache is reused from one prompt to the next
+WORKER = InferenceWorker(llm, INSTRUCTION, max_tokens=MAX_TOKENS)
+
+# ✅ Responses are cached on disk by model + prompt + chunk text, so a rerun only
+# runs the model on chunks it hasn't seen with this prompt and settings
+CACHE = LLMCache()
+CACHE_MODEL = f"{os.path.basename(MODEL_PATH)}:max_tokens={MAX_TOKENS}"
+CACHE_TEMPLATE = PROMPT_TEMPLATE.replace("{instruction}", INSTRUCTION)
+
+# ✅ "json" writes one file per filing, "jsonl.zst" or "parquet" batch the filings into
+# size-bounded shards with a manifest instead (see process/shard_writer.py)
+OUTPUT_FORMAT = "json"
+SHARD_DIR = os.path.join(OUTPUT_DIR, "shards")
+SHARDS = None  # the open shard writer while a sharded run is going
+
+# ✅ Every finished batch is appended to this log right away (fsynced in groups), so a crash
+# only loses what was in flight: a rerun skips the logged batches. RESUME = False starts over.
+RESULT_LOG = os.path.join(OUTPUT_DIR, "log", "results.jsonl")
+RESUME = True
+RESULTS = None  # the open result log while a run is going
+
+def count_tokens(text):
+    """Tokens as the loaded model counts them."""
+    return len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+# ✅ Prompt + answer must fit n_ctx, batches are packed up to what's left
+BATCH_TOKENS = CONTEXT_TOKENS - MAX_TOKENS - count_tokens(WORKER.prompt("")) - 16
 
 def delete_existing_files():
     """Deletes all existing files in mistral_process before starting."""
@@ -35,6 +72,9 @@ def delete_existing_files():
             file_path = os.path.join(OUTPUT_DIR, file)
             if os.path.isfile(file_path):
                 os.remove(file_path)
+        shutil.rmtree(SHARD_DIR, ignore_errors=True)  # ✅ Shards start over too
+        if not RESUME and os.path.exists(RESULT_LOG):
+            os.remove(RESULT_LOG)
     else:
         os.makedirs(OUTPUT_DIR)
     print("🗑️ Deleted all previous files in mistral_process.\n")
@@ -51,36 +91,29 @@ def find_filing_files(base_dir):
                     filing_files.append((ticker, filing_id, os.path.join(root, file)))
     return filing_files
 
-def detect_html(content):
-    """Check if a file contains HTML tags."""
-    return "<html" in content.lower() or "<body" in content.lower()
+def read_file_in_chunks(file_path, chunk_tokens=CHUNK_TOKENS, ticker=None, filing_id=None):
+    """Generator that reads a file in token-budgeted chunks, cut on text boundaries, and processes HTML if needed.
 
-def extract_text_from_html(content):
-    """Extract meaningful text from HTML content."""
-    soup = BeautifulSoup(content, "html.parser")
-    return soup.get_text(separator="\n", strip=True)
+    With ticker/filing_id given, paragraphs repeated from the ticker's prior filing are left out.
+    """
+    content = dedup.read_filing_text(file_path)
 
-def read_file_in_chunks(file_path, chunk_size=CHUNK_SIZE):
-    """Generator that reads a file in chunks and processes HTML if needed."""
-    with open(file_path, "r", encoding="utf-8") as file:
-        content = file.read().strip()
+    if SKIP_REPEATED and ticker:
+        content, dropped = dedup.drop_repeated(ticker, filing_id, content)
+        if dropped:
+            print(f"♻️ {ticker}-{filing_id}: skipped {dropped} paragraphs repeated from the prior filing")
     
-    if detect_html(content):
-        content = extract_text_from_html(content)
-    
-    for i in range(0, len(content), chunk_size):
-        yield content[i:i + chunk_size]
+    yield from chunker.split_text(content, chunk_tokens, count_tokens)
 
 def process_batch(batch):
-    """Send a batch of text chunks to Mistral 7B for processing."""
+    """Send a batch of text chunks to Mistral 7B, unless the same batch was already answered with this prompt."""
+    return CACHE.run(CACHE_MODEL, CACHE_TEMPLATE, "\0".join(batch), lambda: run_model(batch))
+
+def run_model(batch):
+    """Queue a batch of text chunks for Mistral 7B and wait for the answer."""
     for _ in range(MAX_RETRIES):
         try:
-            time.sleep(1)  # ✅ Prevent overload
-
-            prompt = "\n\n".join(batch) + "\n\nExtract relevant sections and structure into JSON."
-            response = llm(prompt, max_tokens=500)  # ✅ Process with Mistral
-
-            return response["choices"][0]["text"].strip()
+            return WORKER.complete("\n\n".join(batch))  # ✅ Process with Mistral
 
         except Exception as e:
             print(f"⚠️ LLM Error: {e}")
@@ -88,70 +121,107 @@ def process_batch(batch):
     print("❌ Max retries reached. Skipping batch.")
     return ""
 
-def load_existing_content(output_filename):
-    """Loads existing content from a JSON file if it exists."""
-    if os.path.exists(output_filename):
-        with open(output_filename, "r", encoding="utf-8") as file:
-            try:
-                data = json.load(file)
-                return data.get("full_text", "")
-            except json.JSONDecodeError:
-                print(f"⚠️ Warning: {output_filename} is corrupted. Creating a new file.")
-                return ""
-    return ""
-
 def process_single_filing(ticker, filing_id, file_path, progress_bar):
     """Processes a single SEC filing using Mistral 7B."""
     progress_bar.set_description(f"Processing {ticker}-{filing_id}")
     output_filename = os.path.join(OUTPUT_DIR, f"{ticker}_{filing_id}.json")
 
-    existing_content = load_existing_content(output_filename)
-    combined_text = existing_content
-
-    batch = []
-    chunks = list(read_file_in_chunks(file_path))
+    chunks = list(read_file_in_chunks(file_path, ticker=ticker, filing_id=filing_id))
+    # ✅ First-fit decreasing into near-full context windows, batches keep their chunks in document order
+    packed = chunker.pack([count_tokens(chunk) for chunk in chunks], BATCH_TOKENS)
+    batches = [[chunks[i] for i in indices] for indices in packed]
+
+    def run_batch(item):
+        index, batch = item
+        prompt = result_log.prompt_hash(CACHE_MODEL, CACHE_TEMPLATE, *batch)
+        if RESULTS.get(ticker, filing_id, index, prompt) is not None:
+            return True  # ✅ Logged by an earlier run
+        response = process_batch(batch)
+        if response:  # ✅ "" (retries ran out) isn't logged, the next run tries again
+            RESULTS.append(ticker, filing_id, index, prompt, response)
+        return bool(response)
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        futures = []
-        for i, chunk in enumerate(tqdm(chunks, desc=f"Processing {ticker}-{filing_id}", leave=False)):
-            batch.append(chunk)
-            if len(batch) >= BATCH_SIZE:
-                futures.append(executor.submit(process_batch, batch[:]))
-                batch = []
+        logged = list(executor.map(run_batch, tqdm(list(enumerate(batches)), desc=f"Processing {ticker}-{filing_id}", leave=False)))
 
-        if batch:
-            futures.append(executor.submit(process_batch, batch))
+    # ✅ Put together from the log in batch order, whatever order they finished in
+    combined_text = RESULTS.assemble(ticker, filing_id, range(len(batches)))
 
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result:
-                combined_text += result + "\n\n"
-
-    with open(output_filename, "w", encoding="utf-8") as output_file:
-        json.dump({"ticker": ticker, "filing_id": filing_id, "full_text": combined_text}, output_file, indent=4)
+    if SHARDS is not None:
+        SHARDS.add_filing(ticker, filing_id, [{"section": "full_text", "text": combined_text}])
+    else:
+        with open(output_filename, "w", encoding="utf-8") as output_file:
+            json.dump({"ticker": ticker, "filing_id": filing_id, "full_text": combined_text}, output_file, indent=4)
 
     progress_bar.update(1)
-    print(f"✅ Saved {output_filename} (Appended)")
+    print(f"✅ Saved {output_filename}")
+    return logged.count(False)  # ✅ Batches still missing
+
+def process_ticker(ticker_filings, previous, progress_bar):
+    """Returns [(ticker, filing_id, error)] for the ticker's filings."""
+    done = []
+    for ticker, filing_id, file_path in ticker_filings:
+        try:
+            if SKIP_REPEATED:
+                dedup.index_prior(ticker, filing_id, previous)  # ✅ The prior filing may belong to another shard
+            missing = process_single_filing(ticker, filing_id, file_path, progress_bar)
+            done.append((ticker, filing_id, f"{missing} batches failed" if missing else None))
+        except Exception as e:
+            print(f"❌ Error processing {ticker} {filing_id}: {e}")
+            done.append((ticker, filing_id, str(e)))
+    return done
+
+def process_filings(shard=None):
+    """Process all filings using Mistral 7B locally.
+
+    With shard=(i, N) only the filings whose accession hashes to shard i, into their own partition of OUTPUT_DIR.
+    """
+    global OUTPUT_DIR, SHARD_DIR, RESULT_LOG, SHARDS, RESULTS
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if shard is not None:
+        # ✅ Everything this shard writes (JSONs, shards, result log) goes into its own partition
+        OUTPUT_DIR = partition.partition_dir(OUTPUT_DIR, shard)
+        SHARD_DIR = os.path.join(OUTPUT_DIR, "shards")
+        RESULT_LOG = os.path.join(OUTPUT_DIR, "log", "results.jsonl")
 
-def process_filings():
-    """Process all filings using Mistral 7B locally."""
     delete_existing_files()
-    filings = find_filing_files(BASE_DIR)
+    all_filings = find_filing_files(BASE_DIR)
+    filings = [filing for filing in all_filings if partition.owns(filing[1], shard)]
+    previous = dedup.previous_filings(all_filings)
+    if OUTPUT_FORMAT != "json":
+        SHARDS = shard_writer.ShardWriter(SHARD_DIR, OUTPUT_FORMAT)
+    RESULTS = result_log.ResultLog(RESULT_LOG)
 
-    print(f"🔄 Processing {len(filings)} filings...\n")
+    print(f"🔄 Processing {len(filings)} filings{f' (shard {shard[0]}/{shard[1]})' if shard else ''}...\n")
 
+    done = []
     with tqdm(total=len(filings), desc="Overall Progress") as progress_bar:
         with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-            futures = {executor.submit(process_single_filing, ticker, filing_id, file_path, progress_bar): (ticker, filing_id) for ticker, filing_id, file_path in filings}
-
+            # ✅ One thread per ticker, its filings in date order so each is compared against the one before
+            futures = [executor.submit(process_ticker, ticker_filings, previous, progress_bar) for ticker_filings in dedup.group_by_ticker(filings)]
             for future in concurrent.futures.as_completed(futures):
-                ticker, filing_id = futures[future]
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"❌ Error processing {ticker} {filing_id}: {e}")
-
+                done += future.result()
+
+    WORKER.close()
+    RESULTS.close()
+    if SHARDS is not None:
+        SHARDS.close()  # ✅ Commits the last shard
+    if shard is not None:
+        partition.write_manifest(OUTPUT_DIR, shard, done, started=started, base_dir=os.path.abspath(BASE_DIR))
     print("\n✅ All filings processed!")
+    WORKER.report()
+    CACHE.report()
 
 # Run the optimized processing function
-process_filings()
+#   python mistral_process.py               every filing
+#   python mistral_process.py --shard 0/4   shard 0 of 4, one per box (each box loads its own model)
+#   python mistral_process.py --merge 4     check the 4 shards together processed every filing once
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize 10-K filings with a local Mistral model")
+    parser.add_argument("--shard", help="i/N: only the filings whose accession hashes to shard i of N (i from 0)")
+    parser.add_argument("--merge", type=int, metavar="N", help="merge and verify the manifests of an N-shard run")
+    args = parser.parse_args()
+
+    if args.merge:
+        sys.exit(0 if partition.merge(OUTPUT_DIR, [filing[:2] for filing in find_filing_files(BASE_DIR)], args.merge) else 1)
+    process_filings(partition.parse(args.shard) if args.shard else None)
@@ -0,0 +1,36 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Write to a temp file next to the target, then os.replace it in: readers only ever
+# see the old file or the whole new one, never half of it. The temp name carries the
+# pid and thread, so sharded runs and worker threads writing the same path don't collide.
+
+
+def fsync_replace(tmp_path, path):
+    """Flushes an already written temp file to disk and renames it over path."""
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def atomic_write(path, binary=False, fsync=True):
+    """`with atomic_write(path) as f:` writes f to path in one go when the block ends.
+
+    fsync=False skips the flush to disk, for files that are fine to lose in a crash
+    (caches, snapshots that get rewritten anyway) as long as they are never half written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb" if binary else "w", encoding=None if binary else "utf-8") as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,178 @@
+import re
+
+# Splits filing text for the LLM stages on section, paragraph and sentence boundaries,
+# measured in real model tokens, then packs the pieces into batches that nearly fill
+# the context window (first-fit decreasing), so a filing needs as few calls as possible.
+CHUNK_TOKENS = 1000  # most a single chunk may hold
+SEPARATOR_TOKENS = 2  # "\n\n" or message framing between chunks of one batch
+CHARS_PER_TOKEN = 4  # estimate when the model's tokenizer isn't available
+
+SECTION_BREAK = re.compile(r"\n(?=[ \t]*(?:item\s*\d{1,2}[a-c]?\b|part\s+[ivx]+\b|### ))", re.IGNORECASE)
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+# Coarsest first, with what goes back between pieces that are glued together again
+LEVELS = [(SECTION_BREAK, "\n"), (PARAGRAPH_BREAK, "\n\n"), (SENTENCE_BREAK, " ")]
+WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def token_counter(model):
+    """len(tokens) with the OpenAI model's tiktoken encoding, or the chars/4 estimate
+    when tiktoken isn't installed."""
+    try:
+        import tiktoken
+    except ImportError:
+        print(f"⚠️ tiktoken isn't installed, counting tokens for {model} as chars/{CHARS_PER_TOKEN} (pip install tiktoken)")
+        return estimate_tokens
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def _split(text, max_tokens, count, levels, size=None):
+    """Cuts text at the coarsest boundary that gets every piece under max_tokens."""
+    if (count(text) if size is None else size) <= max_tokens:
+        return [text]
+    if not levels:
+        return _split_words(text, max_tokens, count)
+
+    pattern, joiner = levels[0]
+    pieces = [piece for piece in pattern.split(text) if piece.strip()]
+    if len(pieces) <= 1:
+        return _split(text, max_tokens, count, levels[1:])
+
+    # Glue neighbours back together while they fit, so chunks are as full as the
+    # boundaries allow, and split further whatever is still too big. Each piece is
+    # counted once, token counts add up closely enough across a boundary.
+    chunks = []
+    current, current_size = [], 0
+    for piece in pieces:
+        piece_size = count(piece)
+        if current and current_size + SEPARATOR_TOKENS + piece_size > max_tokens:
+            chunks.extend(_split(joiner.join(current), max_tokens, count, levels[1:], current_size))
+            current, current_size = [], 0
+        current_size += piece_size + (SEPARATOR_TOKENS if current else 0)
+        current.append(piece)
+    if current:
+        chunks.extend(_split(joiner.join(current), max_tokens, count, levels[1:], current_size))
+    return chunks
+
+
+def _split_words(text, max_tokens, count):
+    # Last resort for one giant "sentence" (usually a flattened table). Per-word counts
+    # don't add up to the count of the joined words (the spaces count too, and the
+    # estimate rounds every word down), so each chunk's length is settled with the real
+    # count of the joined words, starting from the per-word guess.
+    words = text.split()
+    chunks = []
+    start = 0
+    while start < len(words):
+        guess, total = 0, 0
+        while start + guess < len(words):
+            total += count(" " + words[start + guess]) if guess else count(words[start])
+            if guess and total > max_tokens:
+                break
+            guess += 1
+        size = _longest_fit(words, start, guess, max_tokens, count)
+        chunks.append(" ".join(words[start:start + size]))
+        start += size
+    return chunks
+
+
+def _longest_fit(words, start, guess, max_tokens, count):
+    """How many words from start on fit in max_tokens together (at least one):
+    gallops from guess to bracket the answer, then binary searches."""
+    left = len(words) - start
+
+    def fits(size):
+        return count(" ".join(words[start:start + size])) <= max_tokens
+
+    guess = max(1, min(guess, left))
+    if fits(guess):
+        low, high, step = guess, None, 1
+        while high is None:
+            if low == left:
+                return low
+            candidate = min(low + step, left)
+            if fits(candidate):
+                low, step = candidate, step * 2
+            else:
+                high = candidate
+    else:
+        low, high, step = None, guess, 1
+        while low is None:
+            candidate = max(high - step, 1)
+            if candidate == 1 or fits(candidate):
+                low = candidate  # one word over the cap still goes out on its own
+            else:
+                high, step = candidate, step * 2
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def _fit(chunk, max_tokens, count):
+    """Pieces are counted one at a time, and counts don't add up exactly across the
+    whitespace that joins them, so every chunk is counted whole before it goes out.
+    One that is still over the cap is cut at the last whitespace that fits (binary search)."""
+    pieces = []
+    while count(chunk) > max_tokens:
+        cuts = [match.start() for match in WHITESPACE.finditer(chunk)]
+        if not cuts:
+            break  # one word bigger than the cap, nowhere to cut
+        best, low, high = 0, 0, len(cuts) - 1  # the first word alone if nothing fits
+        while low <= high:
+            middle = (low + high) // 2
+            if count(chunk[:cuts[middle]]) <= max_tokens:
+                best, low = middle, middle + 1
+            else:
+                high = middle - 1
+        pieces.append(chunk[:cuts[best]].strip())
+        chunk = chunk[cuts[best]:].strip()
+    pieces.append(chunk)
+    return pieces
+
+
+def split_text(text, max_tokens=CHUNK_TOKENS, count=estimate_tokens):
+    """Chunks of at most max_tokens, in document order, cut between sections, then
+    paragraphs, then sentences, and only mid-sentence when nothing else fits."""
+    chunks = [chunk.strip() for chunk in _split(text.strip(), max_tokens, count, LEVELS) if chunk.strip()]
+    return [piece for chunk in chunks for piece in _fit(chunk, max_tokens, count)]
+
+
+def pack(sizes, budget):
+    """First-fit decreasing: groups chunk indices into as few bins of at most budget
+    tokens as it can. Each bin lists its indices in document order."""
+    bins = []  # [room left, [indices]]
+    for index in sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True):
+        size = sizes[index] + SEPARATOR_TOKENS
+        for entry in bins:
+            if entry[0] >= size:
+                entry[0] -= size
+                entry[1].append(index)
+                break
+        else:
+            bins.append([budget - size, [index]])
+
+    # Batches go out (and come back) in the order of their first chunk
+    return sorted((sorted(indices) for _, indices in bins), key=lambda indices: indices[0])
+
+
+def plan_batches(text, batch_tokens, chunk_tokens=CHUNK_TOKENS, count=estimate_tokens):
+    """Chunks a filing and packs the chunks into batches that fit batch_tokens.
+
+    Returns (chunks, batches): chunks in document order, and batches as lists of chunk indices.
+    """
+    chunks = split_text(text, min(chunk_tokens, batch_tokens - SEPARATOR_TOKENS), count)
+    return chunks, pack([count(chunk) for chunk in chunks], batch_tokens)
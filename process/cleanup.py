@@ -1,8 +1,8 @@
-import nltk
-from nltk.corpus import stopwords
-nltk.download("stopwords")
-stop_words = set(stopwords.words("english"))
+from process import models
+
+VERSION = 1
 
 def remove_stopwords(text):
+    stop_words = models.get_stop_words()  # loaded (from the local NLTK data) on first use
     words = text.split()
     return " ".join([word for word in words if word.lower() not in stop_words])
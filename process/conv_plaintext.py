@@ -1,5 +1,7 @@
 import unicodedata
 
+VERSION = 1
+
 def normalize_text(text):
     text = unicodedata.normalize("NFKC", text)  # Normalize Unicode
     text = text.replace("\n", " ").strip()  # Remove unnecessary newlines
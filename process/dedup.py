@@ -0,0 +1,185 @@
+import os
+import re
+import zlib
+import numpy as np
+from bs4 import BeautifulSoup
+from process import sgml_split
+from process.atomic import atomic_write
+
+# Year-over-year boilerplate detection. Every paragraph of a filing gets a MinHash
+# signature over its word shingles, and paragraphs that are near-duplicates of one in
+# the same ticker's prior filing are flagged, so later stages only pay for new text.
+#
+#   dedup_index/<ticker>/<filing_id>.npy    (paragraphs x NUM_PERM) uint32 signatures
+#
+# The filing helpers at the bottom (date order per ticker, indexing the prior filing)
+# are shared by gpt_process.py and mistral_process.py.
+INDEX_DIR = "dedup_index"
+SHINGLE = 5  # words per shingle
+MIN_WORDS = 20  # shorter paragraphs (headings, page numbers, table rows) are always kept
+NUM_PERM = 128
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows, candidates show up from ~0.7 similarity
+THRESHOLD = 0.8  # estimated Jaccard similarity that counts as "the same paragraph"
+PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(1)  # fixed, signatures must stay comparable across runs
+_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+
+# A blank line, or a line break right after the end of a sentence (text pulled out of
+# HTML often has one line per text node, so a plain newline can be mid-sentence)
+PARAGRAPH_BREAK = re.compile(r"\n[ \t\xa0]*\n\s*|(?<=[.!?:;])[ \t\xa0]*\n\s*")
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def paragraphs(text):
+    return [paragraph.strip() for paragraph in PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+
+
+def signature(paragraph):
+    """MinHash signature of a paragraph's word shingles, or None if it's too short to judge."""
+    words = WORD.findall(paragraph.lower())
+    if len(words) < MIN_WORDS:
+        return None
+
+    shingles = {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+    hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    hashes %= PRIME
+    # (a * x + b) mod p for every permutation at once, then the min over shingles
+    return ((np.outer(_A, hashes) + _B[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def filing_order(filing_id):
+    """Sort key that puts a ticker's filings in date order.
+
+    Accession numbers look like 0000066740-03-000005, the middle part is the year.
+    """
+    parts = filing_id.split("-")
+    if len(parts) == 3 and parts[1].isdigit():
+        year = int(parts[1])
+        return (1900 + year if year >= 90 else 2000 + year, parts[2], filing_id)
+    return (0, "", filing_id)
+
+
+def _band_keys(signature):
+    rows = NUM_PERM // BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(BANDS)]
+
+
+def _path(ticker, filing_id, index_dir):
+    return os.path.join(index_dir, ticker, f"{filing_id}.npy")
+
+
+def prior_filing(ticker, filing_id, index_dir=INDEX_DIR):
+    """The latest indexed filing of this ticker that came before filing_id, or None."""
+    folder = os.path.join(index_dir, ticker)
+    if not os.path.isdir(folder):
+        return None
+    earlier = [name[:-4] for name in os.listdir(folder)
+               if name.endswith(".npy") and filing_order(name[:-4]) < filing_order(filing_id)]
+    return max(earlier, key=filing_order) if earlier else None
+
+
+def is_indexed(ticker, filing_id, index_dir=INDEX_DIR):
+    return os.path.exists(_path(ticker, filing_id, index_dir))
+
+
+def index_filing(ticker, filing_id, paragraphs, index_dir=INDEX_DIR):
+    """Saves a filing's signatures and returns them (None for paragraphs too short to judge).
+
+    The file is swapped in whole, sharded runs on one index can write the same filing at once.
+    """
+    signatures = [signature(paragraph) for paragraph in paragraphs]
+    kept = [sig for sig in signatures if sig is not None]
+
+    with atomic_write(_path(ticker, filing_id, index_dir), binary=True) as f:
+        np.save(f, np.array(kept, dtype=np.uint32).reshape(len(kept), NUM_PERM))
+    return signatures
+
+
+def flag_repeated(ticker, filing_id, paragraphs, index_dir=INDEX_DIR):
+    """Which paragraphs are near-duplicates of a paragraph in the ticker's prior filing.
+
+    Returns a list of bools, one per paragraph. The filing's own signatures are saved,
+    so it becomes the prior for the next one: run a ticker's filings in date order.
+    With no prior filing indexed yet nothing is flagged.
+    """
+    signatures = index_filing(ticker, filing_id, paragraphs, index_dir)
+
+    prior = prior_filing(ticker, filing_id, index_dir)
+    if prior is None:
+        return [False] * len(paragraphs)
+    previous = np.load(_path(ticker, prior, index_dir))
+
+    # LSH: only paragraphs sharing a whole band with one of the prior's get compared
+    buckets = {}
+    for row, sig in enumerate(previous):
+        for key in _band_keys(sig):
+            buckets.setdefault(key, []).append(row)
+
+    flags = []
+    for sig in signatures:
+        repeated = False
+        if sig is not None:
+            candidates = {row for key in _band_keys(sig) for row in buckets.get(key, ())}
+            for row in candidates:
+                if np.count_nonzero(previous[row] == sig) / NUM_PERM >= THRESHOLD:
+                    repeated = True
+                    break
+        flags.append(repeated)
+    return flags
+
+
+def drop_repeated(ticker, filing_id, text, index_dir=INDEX_DIR):
+    """text without the paragraphs repeated from the prior filing, plus how many were dropped."""
+    parts = paragraphs(text)
+    flags = flag_repeated(ticker, filing_id, parts, index_dir)
+    kept = [part for part, repeated in zip(parts, flags) if not repeated]
+    return "\n\n".join(kept), len(parts) - len(kept)
+
+
+def detect_html(content):
+    """Check if a file contains HTML tags."""
+    return "<html" in content.lower() or "<body" in content.lower()
+
+
+def extract_text_from_html(content):
+    """Extract meaningful text from HTML content."""
+    soup = BeautifulSoup(content, "html.parser")
+    return soup.get_text(separator="\n", strip=True)
+
+
+def read_filing_text(file_path):
+    """The filing as plain text, before dedup and chunking."""
+    # Only the main 10-K documents, decoded straight out of the mapped file (graphics and
+    # exhibits are skipped, cp1252 bytes don't fail the filing)
+    content = sgml_split.read_documents(file_path).strip()
+
+    if detect_html(content):
+        content = extract_text_from_html(content)
+    return content
+
+
+def group_by_ticker(filings):
+    """(ticker, filing_id, file_path) filings per ticker, each list in filing date order."""
+    tickers = {}
+    for filing in sorted(filings, key=lambda filing: (filing[0], filing_order(filing[1]))):
+        tickers.setdefault(filing[0], []).append(filing)
+    return list(tickers.values())
+
+
+def previous_filings(filings):
+    """(ticker, filing_id) -> the ticker's filing right before it, as (ticker, filing_id, file_path)."""
+    previous = {}
+    for ticker_filings in group_by_ticker(filings):
+        for before, filing in zip(ticker_filings, ticker_filings[1:]):
+            previous[filing[:2]] = before
+    return previous
+
+
+def index_prior(ticker, filing_id, previous, index_dir=INDEX_DIR):
+    """Makes sure the filing before this one is in the index. In a sharded run it may
+    belong to another shard, this way every filing is compared against the same one."""
+    prior = previous.get((ticker, filing_id))
+    if prior and not is_indexed(prior[0], prior[1], index_dir):
+        index_filing(prior[0], prior[1], paragraphs(read_filing_text(prior[2])), index_dir)
@@ -1,12 +1,57 @@
-import magic
+import re
 
-def detect_format(file_path):
-    mime = magic.Magic(mime=True)
-    file_type = mime.from_file(file_path)
-    
-    if "html" in file_type:
+VERSION = 2
+
+# Only this much of each <TEXT> block is ever looked at
+SNIFF_BYTES = 4096
+# How far into a full-submission we look for the first <TEXT> (the SEC header is a few KB)
+HEADER_BYTES = 64 * 1024
+
+UUENCODE = re.compile(rb"^begin [0-7]{3,4} \S", re.MULTILINE)
+HTML_TAG = re.compile(rb"<(?:!doctype\s+html|html|head|body|p|div|table|font|center|br|a)\b", re.IGNORECASE)
+IXBRL = re.compile(rb"<ix:|xmlns:ix=", re.IGNORECASE)
+XBRL = re.compile(rb"<(?:\w+:)?xbrl\b|xmlns(?::\w+)?=\"http://www\.xbrl\.org", re.IGNORECASE)
+
+
+def sniff(prefix):
+    """Classifies the start of one document's <TEXT> block.
+
+    Returns "html", "ixbrl", "xbrl", "pdf", "uuencode" or "text". No parsing and
+    no native library, just a few checks on the first SNIFF_BYTES.
+    """
+    if isinstance(prefix, str):
+        prefix = prefix.encode("utf-8", errors="replace")
+    head = prefix[:SNIFF_BYTES].lstrip()
+
+    # EDGAR wraps binary exhibits as <PDF>/<XBRL>/... followed by the payload
+    if head.startswith(b"%PDF-") or head[:5].upper() == b"<PDF>":
+        return "pdf"
+    if UUENCODE.search(head[:512]):
+        return "uuencode"
+    if head[:6].upper() == b"<XBRL>" or (head.startswith(b"<?xml") and XBRL.search(head)):
+        # inline XBRL is XHTML with ix: tags, plain XBRL is an XML instance
+        return "ixbrl" if IXBRL.search(head) else "xbrl"
+    if IXBRL.search(head) and HTML_TAG.search(head):
+        return "ixbrl"
+    if HTML_TAG.search(head):
         return "html"
-    elif "text" in file_type:
-        return "text"
-    else:
-        return "unknown"
+    return "text"
+
+
+def detect_format(file_path):
+    """Format of a file's main document, looking only at a bounded prefix.
+
+    For a full-submission.txt that is the first <TEXT> block, otherwise the start of the file.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(HEADER_BYTES)
+
+    start = head.find(b"<TEXT>")
+    if start != -1:
+        head = head[start + len(b"<TEXT>"):]
+        if len(head) < SNIFF_BYTES:
+            # <TEXT> sat right at the end of what we read
+            with open(file_path, "rb") as f:
+                f.seek(start + len(b"<TEXT>"))
+                head = f.read(SNIFF_BYTES)
+    return sniff(head)
@@ -0,0 +1,87 @@
+from functools import cached_property
+from bs4 import BeautifulSoup, Tag
+
+# What get_text puts between the strings of the tree, see ParsedFiling.text
+TEXT_SEPARATOR = " "
+
+
+class ParsedFiling:
+    """One filing's HTML, parsed once and shared by every stage.
+
+    The tree is only built the first time something needs it, and each view
+    (text, tables, anchors, TOC candidates) is computed once and then reused.
+    """
+
+    def __init__(self, html_content, name=None):
+        self.html = html_content
+        self.name = name
+
+    @cached_property
+    def soup(self):
+        try:
+            # Use lxml if available (faster and handles large files well)
+            return BeautifulSoup(self.html, "lxml")
+        except Exception:
+            # Fallback to built-in html.parser if lxml is not installed
+            return BeautifulSoup(self.html, "html.parser")
+
+    @cached_property
+    def text(self):
+        return self.soup.get_text(separator=TEXT_SEPARATOR)
+
+    @cached_property
+    def tables(self):
+        return self.soup.find_all("table")
+
+    @cached_property
+    def anchors(self):
+        """Maps every name=/id= anchor to its tag."""
+        anchors = {}
+        for tag in self.soup.find_all(attrs={"name": True}):
+            anchors.setdefault(tag["name"], tag)
+        for tag in self.soup.find_all(attrs={"id": True}):
+            anchors.setdefault(tag["id"], tag)
+        return anchors
+
+    @cached_property
+    def anchor_index(self):
+        """(text, {anchor: offset into text}), where text is self.text and every name=/id=
+        points at the offset where the first text after it starts.
+
+        One walk over the tree we already have, counting the same strings get_text joins,
+        so the offsets line up with self.text and nothing is parsed a second time.
+        """
+        joined = {id(string) for string in self.soup.strings}  # what get_text joins
+        anchors = {}
+        pending = []  # anchors waiting for the next piece of text
+        offset = 0
+        first = True
+        for node in self.soup.descendants:
+            if isinstance(node, Tag):
+                for key in ("name", "id"):
+                    value = node.get(key)
+                    if value and isinstance(value, str) and value not in anchors:
+                        pending.append(value)
+            elif id(node) in joined:
+                if not first:
+                    offset += len(TEXT_SEPARATOR)
+                for anchor in pending:
+                    anchors.setdefault(anchor, offset)
+                pending = []
+                offset += len(node)
+                first = False
+        for anchor in pending:  # anchors at the very end point past the last char
+            anchors.setdefault(anchor, offset)
+        return self.text, anchors
+
+    @cached_property
+    def toc_candidates(self):
+        """Tables that mention TABLE OF CONTENTS, in document order."""
+        return [table for table in self.tables if "TABLE OF CONTENTS" in table.get_text()]
+
+
+def as_filing(content, name=None):
+    """Lets stages take either raw HTML or an already parsed filing."""
+    if isinstance(content, ParsedFiling):
+        return content
+    return ParsedFiling(content, name)
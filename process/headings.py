@@ -0,0 +1,201 @@
+import re
+
+# Finds section headings in a filing's extracted text with one regex built per
+# filing from the TOC titles plus the standard 10-K items. The text is scanned
+# once, so nested tags can't be counted twice and nothing is lowercased or copied.
+
+# Standard 10-K items (Form 10-K, General Instruction J / Regulation S-K)
+ITEM_TITLES = {
+    "1": "Business",
+    "1A": "Risk Factors",
+    "1B": "Unresolved Staff Comments",
+    "1C": "Cybersecurity",
+    "2": "Properties",
+    "3": "Legal Proceedings",
+    "4": "Mine Safety Disclosures",
+    "5": "Market for Registrant's Common Equity, Related Stockholder Matters and Issuer Purchases of Equity Securities",
+    "6": "Selected Financial Data",
+    "7": "Management's Discussion and Analysis of Financial Condition and Results of Operations",
+    "7A": "Quantitative and Qualitative Disclosures About Market Risk",
+    "8": "Financial Statements and Supplementary Data",
+    "9": "Changes in and Disagreements with Accountants on Accounting and Financial Disclosure",
+    "9A": "Controls and Procedures",
+    "9B": "Other Information",
+    "10": "Directors, Executive Officers and Corporate Governance",
+    "11": "Executive Compensation",
+    "12": "Security Ownership of Certain Beneficial Owners and Management and Related Stockholder Matters",
+    "13": "Certain Relationships and Related Transactions, and Director Independence",
+    "14": "Principal Accountant Fees and Services",
+    "15": "Exhibits and Financial Statement Schedules",
+}
+
+# Titles older filings use, by item number (Item 4 before 2011)
+OLD_TITLES = {
+    "4": "Submission of Matters to a Vote of Security Holders",
+}
+
+ITEM_PREFIX = r"(?:item\s*(?P<number>\d{1,2}[a-c]?)\W*)?"
+# "ITEM 7A." alone on its line, with the title on the next one (or misspelled)
+ITEM_LINE = r"item\s*(?P<item>\d{1,2}[a-c]?)[ \t]*[.:]?[ \t]*$"
+# Matches of the same heading closer than this are one heading ("ITEM 1." then "BUSINESS")
+NEAR = 200
+# A heading is the whole line: only punctuation or a page number may follow the title
+LINE_END = r"(?=[ \t]*[.:]?[ \t]*\d*[ \t]*$)"
+# Headings closer together than this are TOC lines, when at least TOC_MIN of them run together
+TOC_GAP = 400
+TOC_MIN = 3
+
+
+def normalize(title):
+    """Lowercase words only: "ITEM 1A. RISK FACTORS" -> "item 1a risk factors"."""
+    return " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+
+
+def _strip_item(words):
+    # "item 1a risk factors" -> "risk factors", the prefix is matched separately
+    return re.sub(r"^item \d{1,2}[a-c]? ", "", words)
+
+
+def build_matcher(titles=(), standard=True, items=None):
+    """Compiles one regex matching any of the titles as a heading line, or a bare
+    "Item N." line.
+
+    items maps item numbers ("1A") to the TOC's title for them, used to label the
+    bare item lines. Returns (pattern, labels) where labels maps each group name
+    to the title it reports, "item" to the TOC's items, "numbers" to the item
+    number each title belongs to and "words" to the titles by their normalized words.
+    """
+    items = {key.upper(): value for key, value in (items or {}).items()}
+    labels = {"item": items, "numbers": {}, "words": {}}
+    numbers = {title: number for number, title in items.items()}
+    alternatives = {}
+    candidates = list(titles)
+    if standard:
+        candidates += list(ITEM_TITLES.values()) + list(OLD_TITLES.values())
+        for table in (ITEM_TITLES, OLD_TITLES):
+            for number, title in table.items():
+                numbers.setdefault(title, number)
+
+    for title in candidates:
+        words = _strip_item(normalize(title))
+        if not words or words in alternatives:
+            continue
+        name = f"t{len(alternatives)}"
+        # Anything that isn't a letter or digit (spaces, commas, &nbsp;, curly quotes) may sit between words
+        alternatives[words] = f"(?P<{name}>" + r"[\W_]+".join(re.escape(word) for word in words.split()) + ")"
+        labels[name] = title
+        labels["words"][words] = title
+        if title in numbers:
+            labels["numbers"][title] = numbers[title]
+
+    # Longest first, so "other information" can't cut a longer title short
+    ordered = sorted(alternatives, key=len, reverse=True)
+    body = "|".join(alternatives[words] for words in ordered)
+    titled = rf"|{ITEM_PREFIX}(?:{body}){LINE_END}" if body else ""
+    pattern = re.compile(rf"^[ \t]*(?:{ITEM_LINE}{titled})", re.IGNORECASE | re.MULTILINE)
+    return pattern, labels
+
+
+def _next_line_title(text, end, labels):
+    """The known title the line after a bare "Item N." starts with, if any, even when
+    the section's text carries on after it on the same line."""
+    lines = [line for line in text[end:end + NEAR].splitlines() if line.strip()]
+    if not lines:
+        return None
+    words = normalize(lines[0])
+    found = [title for key, title in labels["words"].items() if words == key or words.startswith(key + " ")]
+    return max(found, key=len) if found else None
+
+
+def find_headings(text, matcher):
+    """All heading lines in text, as (offset, item number, title) in document order.
+    The item number is None for titles that don't belong to a known item."""
+    pattern, labels = matcher
+    headings = []
+    seen = {}  # item number -> title this filing used for it (its own TOC lines)
+    bare = False  # last heading was a bare "Item N." line
+    for match in pattern.finditer(text):
+        if match.lastgroup == "item":
+            number = match.group("item").upper()
+            # The filing's own title for the item before the modern one: an old
+            # "ITEM 4." is Submission of Matters..., not Mine Safety Disclosures
+            title = (
+                labels["item"].get(number)
+                or _next_line_title(text, match.end(), labels)
+                or seen.get(number)
+                or ITEM_TITLES.get(number)
+                or f"Item {number}"
+            )
+        else:
+            title = labels[match.lastgroup]
+            number = match.group("number")
+            number = number.upper() if number else labels["numbers"].get(title)
+            if number:
+                seen.setdefault(number, title)
+        if bare and match.lastgroup != "item" and match.start() - headings[-1][0] <= NEAR:
+            # "ITEM 4." with its title on the next line: one heading, named by the title
+            headings[-1] = (headings[-1][0], headings[-1][1], title)
+            bare = False
+            continue
+        headings.append((match.start(), number, title))
+        bare = match.lastgroup == "item"
+    return headings
+
+
+def _key(heading):
+    # Sections are told apart by item number, by title when there is none
+    _, number, title = heading
+    return number or title
+
+
+def _toc_region(headings):
+    """(start, end) offsets of the filing's TOC: the first run of TOC_MIN or more headings
+    that follow each other within TOC_GAP and mostly show up again further down.
+    None when there is no such run."""
+    run = []
+    for i, heading in enumerate(headings + [None]):
+        # An item the run already listed means the body has started
+        if heading is not None and (not run or heading[0] - run[-1][0] <= TOC_GAP) and _key(heading) not in map(_key, run):
+            run.append(heading)
+            continue
+        if len(run) >= TOC_MIN:
+            later = {_key(later_heading) for later_heading in headings[i:]}
+            again = sum(_key(heading) in later for heading in run)
+            if again * 2 >= len(run):
+                return run[0][0], run[-1][0]
+        run = [heading] if heading is not None else []
+    return None
+
+
+def section_spans(text, titles=(), standard=True, items=None):
+    """Splits text into [start, end) spans, one per heading found.
+
+    Headings inside the filing's TOC are skipped. A section that still shows up
+    more than once (keyed by item number, so "Item 4. Submission of Matters..." and
+    a bare "ITEM 4." are one section) is assumed to be listed in an unrecognized
+    TOC first, so its second occurrence is taken as the real heading. Same output
+    shape as toc_extract.section_spans.
+    """
+    found = find_headings(text, build_matcher(titles, standard, items))
+    toc = _toc_region(found)
+    seen = {}
+    for heading in found:
+        offset, _, title = heading
+        if toc and toc[0] <= offset <= toc[1]:
+            continue
+        entry = seen.setdefault(_key(heading), {"title": title, "offsets": []})
+        offsets = entry["offsets"]
+        if not offsets or offset - offsets[-1] > NEAR:
+            offsets.append(offset)
+            if len(offsets) == 2:
+                entry["title"] = title  # the real heading names the section
+
+    starts = sorted(
+        (entry["offsets"][1] if len(entry["offsets"]) > 1 else entry["offsets"][0], entry["title"])
+        for entry in seen.values()
+    )
+    spans = []
+    for i, (start, title) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        spans.append({"title": title, "start": start, "end": end})
+    return spans
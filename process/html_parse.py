@@ -1,16 +1,100 @@
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from process.document import as_filing
+
+VERSION = 1
 # html5lib 
 # def clean_html(html_content):
 #     soup = BeautifulSoup(html_content, "html5lib")  # Handles broken HTML
 #     return soup.get_text(separator=" ")  # Extracts text with spacing
 
-# lxml
+# lxml (html.parser if lxml is not installed), via the filing's shared parse
 def clean_html(html_content):
-    try:
-        # Use lxml if available (faster and handles large files well)
-        soup = BeautifulSoup(html_content, "lxml")
-    except:
-        # Fallback to built-in html.parser if lxml is not installed
-        soup = BeautifulSoup(html_content, "html.parser")
-    
-    return soup.get_text(separator=" ")
+    return as_filing(html_content).text
+
+
+# Streaming mode: html.parser is fed the document a piece at a time and text
+# comes out as it is found, so memory stays flat no matter how big the filing is.
+BLOCK_TAGS = {
+    "p", "div", "br", "hr", "tr", "table", "li", "ul", "ol", "dl", "dt", "dd",
+    "h1", "h2", "h3", "h4", "h5", "h6", "title", "center", "blockquote", "pre",
+    "page", "body", "html", "section", "article",
+}
+SKIP_TAGS = {"style", "script"}
+
+
+class _TextStream(HTMLParser):
+    """Collects text pieces from the tags fed so far, with block tags turned into newlines."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self.skipping = None  # inside <style>/<script>
+        self.separator = ""
+        self.seen_text = False
+
+    def _tag(self, tag):
+        # Separators only go between pieces of text, never in front of the first one
+        if self.seen_text:
+            if tag in BLOCK_TAGS:
+                self.separator = "\n"
+            elif not self.separator:
+                self.separator = " "
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skipping = tag
+        self._tag(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._tag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == self.skipping:
+            self.skipping = None
+        self._tag(tag)
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        if self.separator:
+            self.pieces.append(self.separator)
+            self.separator = ""
+        self.pieces.append(data)
+        self.seen_text = True
+
+    def drain(self):
+        text = "".join(self.pieces)
+        self.pieces = []
+        return text
+
+
+def iter_text(chunks):
+    """Yields the text of an HTML document as it is parsed, chunk by chunk.
+
+    chunks is any iterable of str (e.g. sgml_split.iter_chunks) or a single str.
+    <style>/<script> content is dropped and block level tags become newlines.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+
+    parser = _TextStream()
+    for chunk in chunks:
+        parser.feed(chunk)
+        text = parser.drain()
+        if text:
+            yield text
+
+    parser.close()
+    text = parser.drain()
+    if text:
+        yield text
+
+
+def stream_html(chunks):
+    """Streaming version of clean_html, returns the whole text as one string.
+
+    Only the HTML side is bounded here: the extracted text is still joined (and cached)
+    whole, since the TOC step needs all of it. It is a fraction of the filing's size,
+    markup and graphics are most of that.
+    """
+    return "".join(iter_text(chunks))
@@ -0,0 +1,120 @@
+import os
+import time
+import sqlite3
+import threading
+from process.stage_cache import digest, EVICT_TO, RECOUNT_EVERY
+
+# On-disk cache of LLM responses, so reruns of gpt_process.py / mistral_process.py
+# only pay for chunks (or prompts, or models) that actually changed.
+# Keyed by model + prompt template + hash of the chunk text.
+CACHE_PATH = os.path.join(".llm_cache", "responses.sqlite")
+MAX_BYTES = 1024 ** 3  # 1 GB of response text, least recently used entries go first
+
+
+class LLMCache:
+    """SQLite table of responses with LRU eviction and hit/miss counters.
+
+    Safe to share between the threads of one process.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.total = None  # running size, recounted every RECOUNT_EVERY puts (see stage_cache)
+        self.puts = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, template_hash TEXT, response TEXT, size INTEGER, created REAL, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    def key(self, model, template, chunk):
+        return digest(f"{model}\0{digest(template)}\0{digest(chunk)}")
+
+    def get(self, model, template, chunk):
+        """The cached response, or None on a miss."""
+        key = self.key(model, template, chunk)
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, model, template, chunk, response):
+        key = self.key(model, template, chunk)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, template_hash, response, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, digest(template), response, size, now, now),
+            )
+            self.conn.commit()
+
+            self.puts += 1
+            if self.total is None or self.puts % RECOUNT_EVERY == 0:
+                self.total = self.size()
+            else:
+                self.total += size
+            if self.total > self.max_bytes:
+                self._evict()
+
+    def run(self, model, template, chunk, call):
+        """Cached response for this chunk, or call() and store what it returns.
+        Empty responses (failed calls) are never stored."""
+        response = self.get(model, template, chunk)
+        if response is not None:
+            return response
+        response = call()
+        if response:
+            self.put(model, template, chunk, response)
+        return response
+
+    def size(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        total = self.size()
+        self.total = total
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+        self.conn.commit()
+        self.total = total
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(
+            f"🗄️ LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+            f"{stats['entries']} entries, {stats['bytes'] / 1024 ** 2:.1f} MB"
+        )
@@ -0,0 +1,171 @@
+import os
+import time
+import random
+import asyncio
+import email.utils
+import httpx
+
+# asyncio client for an OpenAI-style /chat/completions endpoint. One client is shared
+# by every filing, so the whole run is scheduled against the account's quota:
+# requests/minute and tokens/minute token buckets, a cap on requests in flight,
+# Retry-After honored for everyone, and jittered exponential backoff on 429/5xx.
+BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
+RPM = 3500  # requests per minute
+TPM = 90000  # tokens per minute (prompt + completion)
+MAX_IN_FLIGHT = 16
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0  # seconds, doubled every retry
+BACKOFF_MAX = 60.0
+TIMEOUT = 120.0
+CHARS_PER_TOKEN = 4  # rough estimate for reserving TPM before the real usage is known
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """rate units per minute, bursts up to capacity. acquire() waits until there's enough."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # Bigger than the bucket can ever hold: wait for a full bucket and go into debt
+        amount = min(amount, self.capacity)
+        async with self.lock:  # first come first served, nobody jumps the queue
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount):
+        """Gives back what was reserved but not used (or takes more, if amount < 0)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def retry_after(response):
+    """Seconds to wait from a Retry-After header (seconds or HTTP date), or None."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt):
+    """Full jitter: anywhere between 0 and BACKOFF_BASE * 2^attempt, capped."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMClient:
+    """Shared request scheduler. Use as `async with LLMClient(...) as client:`."""
+
+    def __init__(self, model, api_key=None, base_url=BASE_URL, rpm=RPM, tpm=TPM,
+                 max_in_flight=MAX_IN_FLIGHT, max_retries=MAX_RETRIES, timeout=TIMEOUT):
+        self.model = model
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY", "")
+        self.base_url = base_url.rstrip("/")
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.paused_until = 0.0  # set by Retry-After, holds back every request
+        self.http = None
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "tokens": 0}
+        self.started = time.monotonic()
+
+    async def __aenter__(self):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        self.http = httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.http.aclose()
+
+    async def _wait_for_pause(self):
+        while True:
+            delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def chat(self, messages, max_tokens=None):
+        """One chat completion, scheduled against the limits. Returns the joined choice
+        texts, or "" once the retries are used up."""
+        body = {"model": self.model, "messages": messages}
+        if max_tokens:
+            body["max_tokens"] = max_tokens
+        estimate = sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN + (max_tokens or 0)
+
+        for attempt in range(self.max_retries):
+            await self._wait_for_pause()
+            await self.requests.acquire()
+            await self.tokens.acquire(estimate)
+
+            try:
+                async with self.in_flight:
+                    self.stats["requests"] += 1
+                    response = await self.http.post("/chat/completions", json=body)
+            except httpx.HTTPError as e:
+                print(f"⚠️ LLM request error: {e}")
+                self.tokens.refund(estimate)
+                self.stats["retries"] += 1
+                await asyncio.sleep(backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS:
+                self.tokens.refund(estimate)
+                self.stats["retries"] += 1
+                wait = retry_after(response)
+                if response.status_code == 429:
+                    self.stats["rate_limited"] += 1
+                if wait is not None:
+                    # The server told us when, so everyone waits that long
+                    self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                else:
+                    await asyncio.sleep(backoff(attempt))
+                continue
+
+            if response.status_code >= 400:
+                print(f"⚠️ LLM API error {response.status_code}: {response.text[:200]}")
+                self.stats["failed"] += 1
+                return ""
+
+            data = response.json()
+            used = (data.get("usage") or {}).get("total_tokens")
+            if used is not None:
+                self.tokens.refund(estimate - used)
+                self.stats["tokens"] += used
+            return "\n\n".join(
+                (choice.get("message") or {}).get("content", "").strip() for choice in data.get("choices", [])
+            )
+
+        print("❌ Max retries reached. Skipping this batch.")
+        self.stats["failed"] += 1
+        return ""
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        stats = self.stats
+        print(
+            f"📡 {stats['requests']} requests ({stats['retries']} retries, {stats['rate_limited']} rate limited, "
+            f"{stats['failed']} failed), {stats['tokens']} tokens in {elapsed:.1f}s "
+            f"({stats['requests'] / max(elapsed, 1e-9) * 60:.0f} req/min, {stats['tokens'] / max(elapsed, 1e-9) * 60:.0f} tokens/min)"
+        )
@@ -0,0 +1,88 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# One thread owns the local llama.cpp model and works through a queue of prompts.
+# llama.cpp runs one prompt at a time anyway, so this replaces threads fighting over
+# the model plus sleeps. Every prompt starts with the same instruction, and since only
+# this thread touches the model, llama-cpp-python finds that prefix already in the KV
+# cache from the previous prompt and only evaluates the new text.
+PROMPT_TEMPLATE = "[INST] {instruction}\n\n{text} [/INST]"  # Mistral instruct format, instruction first
+
+
+class InferenceWorker:
+    """submit(text) -> Future of the completion text. Use as a context manager or call close()."""
+
+    def __init__(self, llm, instruction, max_tokens=500, template=PROMPT_TEMPLATE):
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.template = template
+        self.instruction = instruction
+        self.prefix = template.split("{text}")[0].format(instruction=instruction)
+        self.prefix_tokens = len(llm.tokenize(self.prefix.encode("utf-8")))
+        self.queue = queue.Queue()
+        self.stats = {"prompts": 0, "prompt_tokens": 0, "reused_tokens": 0, "completion_tokens": 0, "busy": 0.0}
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name="llm-worker", daemon=True)
+        self.thread.start()
+
+    def prompt(self, text):
+        return self.template.format(instruction=self.instruction, text=text)
+
+    def submit(self, text):
+        future = Future()
+        self.queue.put((text, future))
+        return future
+
+    def complete(self, text):
+        """Blocking submit, for callers that are threads themselves."""
+        return self.submit(text).result()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            text, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._generate(text))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _generate(self, text):
+        start = time.perf_counter()
+        response = self.llm(self.prompt(text), max_tokens=self.max_tokens)
+        usage = response.get("usage", {})
+
+        stats = self.stats
+        stats["busy"] += time.perf_counter() - start
+        stats["prompts"] += 1
+        stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        stats["reused_tokens"] += self.prefix_tokens if stats["prompts"] > 1 else 0
+        stats["completion_tokens"] += usage.get("completion_tokens", 0)
+        return response["choices"][0]["text"].strip()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def report(self):
+        stats = self.stats
+        elapsed = time.perf_counter() - self.started
+        busy = max(stats["busy"], 1e-9)
+        evaluated = stats["prompt_tokens"] - stats["reused_tokens"]
+        print(
+            f"🦙 {stats['prompts']} prompts in {elapsed:.1f}s ({stats['prompts'] / max(elapsed, 1e-9):.2f} prompts/s), "
+            f"{(evaluated + stats['completion_tokens']) / busy:.1f} tokens/s "
+            f"({evaluated} prompt tokens evaluated, {stats['reused_tokens']} reused from the shared prefix, "
+            f"{stats['completion_tokens']} generated)"
+        )
@@ -0,0 +1,316 @@
+import os
+import json
+import math
+import time
+import resource
+import platform
+from process.atomic import atomic_write
+
+# Per-stage timing and memory of every filing, so a slow nightly run can be traced
+# to a stage and to the filings that caused it.
+#
+# Each worker appends one JSON line per stage per filing to METRICS_PATH:
+#   {"ts", "pid", "ticker", "filing_id", "stage", "wall_s", "cpu_s", "bytes_in",
+#    "bytes_out", "rss_mb", "peak_rss_delta_mb", "error"}
+# bytes_in/bytes_out are len() of what went in and came out (chars for text).
+# peak_rss_delta_mb is how far RSS peaked above where it was when the stage started.
+# On Linux the peak (VmHWM) is reset before every stage, so it's measured per stage even
+# though a pool worker runs many filings. Elsewhere it falls back to ru_maxrss, the
+# process's lifetime high, and only shows stages that pushed that high up.
+# prometheus_snapshot() turns the file into Prometheus text format, and
+# metrics_summary.py prints p50/p95/p99 per stage and the slowest filings.
+METRICS_DIR = "metrics"
+METRICS_PATH = os.path.join(METRICS_DIR, "stages.jsonl")
+PROMETHEUS_PATH = os.path.join(METRICS_DIR, "html_tokenizer.prom")
+PREFIX = "html_tokenizer"
+QUANTILES = (0.5, 0.95, 0.99)
+# The Prometheus quantiles come from log-spaced buckets this far apart (5%), so the
+# running totals stay small however many filings go by
+BUCKET_RATIO = 1.05
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 1024 ** 2 if hasattr(os, "sysconf") else 0
+
+
+def _lifetime_peak_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if platform.system() == "Darwin" else peak / 1024
+
+
+def peak_rss_mb():
+    """Peak RSS since the last reset_peak() (VmHWM), or the lifetime peak where there's no /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return _lifetime_peak_mb()
+
+
+def reset_peak():
+    """Sets the process's peak RSS back to its current RSS (Linux). Returns whether it could."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def rss_mb():
+    """Current RSS, from /proc where there is one, else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def _length(value):
+    if isinstance(value, (str, bytes, list, tuple, dict)):
+        return len(value)
+    return None
+
+
+class FilingMetrics:
+    """Records the stages of one filing. run(stage, func) times func() and returns its result."""
+
+    def __init__(self, ticker, filing_id, path=METRICS_PATH):
+        self.ticker = ticker
+        self.filing_id = filing_id
+        self.path = path
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.resettable = reset_peak()
+        # Peaks are measured from the RSS a stage starts at, or without a reset from the lifetime high
+        self.peak_started = rss_mb() if self.resettable else peak_rss_mb()
+        self.peak = self.peak_started  # highest peak seen across the filing's stages
+
+    def _write(self, record):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # One short append per line, so lines from different workers don't interleave
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def record(self, stage, wall, cpu, bytes_in=None, bytes_out=None, peak_delta=0.0, error=None):
+        self._write({
+            "ts": time.time(),
+            "pid": os.getpid(),
+            "ticker": self.ticker,
+            "filing_id": self.filing_id,
+            "stage": stage,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "rss_mb": round(rss_mb(), 1),
+            "peak_rss_delta_mb": round(peak_delta, 1),
+            "error": error,
+        })
+
+    def _stage_start(self):
+        if self.resettable and reset_peak():
+            return rss_mb()
+        return peak_rss_mb()
+
+    def _stage_peak(self):
+        peak = peak_rss_mb()
+        self.peak = max(self.peak, peak)
+        return peak
+
+    def run(self, stage, func, bytes_in=None):
+        peak = self._stage_start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        error, result = None, None  # set before the try, so a KeyboardInterrupt isn't hidden by finally
+        try:
+            result = func()
+            return result
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self.record(
+                stage,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                bytes_in=bytes_in,
+                bytes_out=_length(result),
+                peak_delta=self._stage_peak() - peak,
+                error=error,
+            )
+
+    def finish(self, bytes_in=None, error=None):
+        """The "total" line for the whole filing."""
+        self.record(
+            "total",
+            time.perf_counter() - self.started,
+            time.process_time() - self.cpu_started,
+            bytes_in=bytes_in,
+            peak_delta=max(self.peak, peak_rss_mb()) - self.peak_started,
+            error=error,
+        )
+
+
+def load(path=METRICS_PATH):
+    """Every record in a metrics file, skipping a half-written last line."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def quantile(values, q):
+    """Nearest-rank quantile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))]
+
+
+def by_stage(records):
+    stages = {}
+    for record in records:
+        stages.setdefault(record["stage"], []).append(record)
+    return stages
+
+
+def _bucket(value):
+    return None if value <= 0 else math.floor(math.log(value, BUCKET_RATIO))
+
+
+def _bucket_value(bucket):
+    return 0.0 if bucket is None else BUCKET_RATIO ** (bucket + 0.5)  # middle of the bucket
+
+
+class StageTotals:
+    """Running per-stage totals of a metrics file. update() reads only what was appended
+    since the last call, so refreshing the snapshot doesn't re-parse the whole file."""
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = path
+        self.offset = 0  # bytes of the file already counted, always at a line end
+        self.stages = {}
+
+    def add(self, record):
+        totals = self.stages.setdefault(record["stage"], {
+            "count": 0, "wall": 0.0, "cpu": 0.0, "bytes_in": 0, "bytes_out": 0, "errors": 0, "peak": 0.0, "buckets": {},
+        })
+        totals["count"] += 1
+        totals["wall"] += record["wall_s"]
+        totals["cpu"] += record["cpu_s"]
+        totals["bytes_in"] += record["bytes_in"] or 0
+        totals["bytes_out"] += record["bytes_out"] or 0
+        totals["errors"] += 1 if record["error"] else 0
+        totals["peak"] = max(totals["peak"], record["peak_rss_delta_mb"])
+        bucket = _bucket(record["wall_s"])
+        totals["buckets"][bucket] = totals["buckets"].get(bucket, 0) + 1
+
+    def update(self):
+        if not self.path or not os.path.exists(self.path):
+            return self
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a half-written last line waits for the next update
+        for line in data[:end].splitlines():
+            try:
+                self.add(json.loads(line))
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+        self.offset += end
+        return self
+
+    def quantile(self, stage, q):
+        """Nearest-rank quantile of a stage's wall times, to within BUCKET_RATIO."""
+        totals = self.stages[stage]
+        rank = min(totals["count"], max(1, int(round(q * totals["count"] + 0.5))))
+        seen = 0
+        for bucket in sorted(totals["buckets"], key=lambda b: -math.inf if b is None else b):
+            seen += totals["buckets"][bucket]
+            if seen >= rank:
+                return _bucket_value(bucket)
+        return 0.0
+
+
+def prometheus_snapshot(path=METRICS_PATH, out_path=PROMETHEUS_PATH, totals=None):
+    """Writes the metrics file as a Prometheus text-format snapshot (for the node_exporter
+    textfile collector, or just to scrape) and returns the text.
+
+    Pass the same StageTotals on every call to only read what was appended since the last one.
+    """
+    if totals is None:
+        totals = StageTotals(path)
+    stages = totals.update().stages
+
+    lines = [
+        f"# HELP {PREFIX}_stage_seconds Wall time per filing and stage.",
+        f"# TYPE {PREFIX}_stage_seconds summary",
+    ]
+    for stage, items in sorted(stages.items()):
+        for q in QUANTILES:
+            lines.append(f'{PREFIX}_stage_seconds{{stage="{stage}",quantile="{q}"}} {totals.quantile(stage, q):.6f}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {items["wall"]:.6f}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {items["count"]}')
+
+    metrics = [
+        ("stage_cpu_seconds_total", "counter", "CPU time spent per stage.", "cpu"),
+        ("stage_bytes_in_total", "counter", "Input size per stage (chars for text).", "bytes_in"),
+        ("stage_bytes_out_total", "counter", "Output size per stage (chars for text).", "bytes_out"),
+        ("stage_errors_total", "counter", "Stage runs that raised.", "errors"),
+    ]
+    for name, kind, help_text, key in metrics:
+        lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} {kind}"]
+        for stage, items in sorted(stages.items()):
+            lines.append(f'{PREFIX}_{name}{{stage="{stage}"}} {items[key]:g}')
+
+    lines += [f"# HELP {PREFIX}_stage_peak_rss_delta_mb Largest peak RSS growth seen in a stage.", f"# TYPE {PREFIX}_stage_peak_rss_delta_mb gauge"]
+    for stage, items in sorted(stages.items()):
+        lines.append(f'{PREFIX}_stage_peak_rss_delta_mb{{stage="{stage}"}} {items["peak"]:g}')
+
+    text = "\n".join(lines) + "\n"
+    if out_path:
+        with atomic_write(out_path, fsync=False) as f:  # scrapers never see half a file, the next refresh rewrites it anyway
+            f.write(text)
+    return text
+
+
+def summary(path=METRICS_PATH, top=10):
+    """p50/p95/p99 wall time per stage and the slowest filings, as printable text."""
+    records = load(path)
+    if not records:
+        return f"No metrics in {path}"
+
+    out = [f"{'stage':16} {'count':>6} {'p50 s':>9} {'p95 s':>9} {'p99 s':>9} {'total s':>10} {'cpu s':>10} {'max +RSS MB':>12}"]
+    for stage, items in sorted(by_stage(records).items(), key=lambda item: item[0] == "total"):
+        walls = sorted(record["wall_s"] for record in items)
+        out.append(
+            f"{stage:16} {len(walls):6} {quantile(walls, 0.5):9.3f} {quantile(walls, 0.95):9.3f} {quantile(walls, 0.99):9.3f} "
+            f"{sum(walls):10.1f} {sum(record['cpu_s'] for record in items):10.1f} {max(record['peak_rss_delta_mb'] for record in items):12.1f}"
+        )
+
+    totals = [record for record in records if record["stage"] == "total"]
+    slowest = sorted(totals, key=lambda record: record["wall_s"], reverse=True)[:top]
+    if slowest:
+        # Which stage ate the time, per slow filing
+        stages = {}
+        for record in records:
+            if record["stage"] != "total":
+                key = (record["ticker"], record["filing_id"])
+                if record["wall_s"] > stages.get(key, ("", 0))[1]:
+                    stages[key] = (record["stage"], record["wall_s"])
+
+        out.append(f"\nSlowest {len(slowest)} filings:")
+        for record in slowest:
+            stage, wall = stages.get((record["ticker"], record["filing_id"]), ("-", 0))
+            error = " ❌ " + record["error"] if record["error"] else ""
+            out.append(f"  {record['wall_s']:8.2f}s  {record['ticker']}/{record['filing_id']}  (slowest stage: {stage} {wall:.2f}s){error}")
+    return "\n".join(out)
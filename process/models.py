@@ -0,0 +1,91 @@
+import os
+import sys
+import subprocess
+
+# Models and NLTK data load lazily on first use, never at import time.
+# Importing this module (or any stage) touches neither the network nor spaCy/NLTK.
+#
+# Set HTML_TOKENIZER_OFFLINE=1 on air-gapped workers: a missing resource then
+# fails fast instead of trying (and hanging on) a download.
+OFFLINE = os.environ.get("HTML_TOKENIZER_OFFLINE") == "1"
+
+SPACY_MODEL = "en_core_web_sm"
+
+# NLTK resource name -> path nltk.data.find looks for
+NLTK_RESOURCES = {
+    "stopwords": "corpora/stopwords",
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+}
+
+# Worker spawn cost we're willing to pay for importing the pipeline
+IMPORT_BUDGET_MS = 500
+
+_nlp = {}
+_stop_words = None
+_nltk_ready = set()
+
+
+def ensure_nltk(resource):
+    """Checks the local NLTK data dirs for a resource and only downloads it if it's
+    missing and we're allowed to go online."""
+    if resource in _nltk_ready:
+        return
+    import nltk
+
+    try:
+        nltk.data.find(NLTK_RESOURCES[resource])
+    except LookupError:
+        if OFFLINE:
+            raise LookupError(f"NLTK resource {resource!r} is not installed and HTML_TOKENIZER_OFFLINE is set")
+        nltk.download(resource, quiet=True)
+    _nltk_ready.add(resource)
+
+
+def get_nlp(exclude=()):
+    """The spaCy model, loaded on first use. Components in exclude (e.g. "parser",
+    "ner") are never loaded. One copy per set of excluded components per process."""
+    key = tuple(sorted(exclude))
+    if key not in _nlp:
+        import spacy
+
+        _nlp[key] = spacy.load(SPACY_MODEL, exclude=list(key))
+    return _nlp[key]
+
+
+def get_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        ensure_nltk("stopwords")
+        from nltk.corpus import stopwords
+
+        _stop_words = set(stopwords.words("english"))
+    return _stop_words
+
+
+def sent_tokenize(text):
+    """nltk.sent_tokenize, with punkt checked (not downloaded every start) on first use."""
+    ensure_nltk("punkt")
+    ensure_nltk("punkt_tab")
+    from nltk.tokenize import sent_tokenize as nltk_sent_tokenize
+
+    return nltk_sent_tokenize(text)
+
+
+def import_time_ms(module):
+    """Time a fresh interpreter takes to import module, in ms (python -X importtime)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+
+    # Last line for the module itself has the cumulative time in us
+    for line in reversed(result.stderr.splitlines()):
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return 0.0
@@ -1,7 +1,17 @@
-import spacy
 import re
-from bs4 import BeautifulSoup
-nlp = spacy.load("en_core_web_sm")
+import time
+from process import models, toc_extract, headings
+from process.document import as_filing
+# spaCy loads on first use through models.get_nlp(), not at import
+
+# Tokenizing only needs spaCy's tokenizer, so every trained component is left out.
+# Drop a name from here if a later step needs tags, lemmas or entities.
+NLP_EXCLUDE = ("tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner", "senter")
+NLP_BATCH_SIZE = 64  # chunks per nlp.pipe batch
+# Inside main's worker pool keep this at 1: pool workers can't start processes of their own,
+# and the pool already spreads filings over the cores. tokenize_corpus can use more.
+NLP_PROCESSES = 1
+NLP_CHUNK_CHARS = 100000  # well under spaCy's max_length, small enough to batch
 
 def find_table_of_contents(text, name):
     """Extracts the Table of Contents (TOC) dynamically from 10-K filings."""
@@ -129,46 +139,117 @@ def chunk_text(text, chunk_size=500000):  # Adjust chunk size as needed
         yield text[i:i + chunk_size]
 
 
-def extract_sections(html_content,name):
-    """Uses TOC to split the document into sections."""
-    soup = BeautifulSoup(html_content, "lxml")
-    toc_sections = find_table_of_contents(html_content,name)
+def split_at_space(text, chunk_size=NLP_CHUNK_CHARS):
+    """Like chunk_text, but cuts at the last whitespace before chunk_size so no word gets split."""
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end < len(text):
+            cut = text.rfind(" ", start, end)
+            if cut > start:
+                end = cut + 1
+        yield text[start:end]
+        start = end
+
+
+def iter_tokens(items, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES, exclude=NLP_EXCLUDE):
+    """Streams (key, text) pairs through nlp.pipe and yields (key, tokens) for each
+    key in input order, tokens being the non-punctuation, non-space token texts.
+
+    Long texts are cut into chunks so they batch well, and put back together by key.
+    The model is loaded once per process (models.get_nlp).
+    """
+    nlp = models.get_nlp(exclude=exclude)
+
+    def chunks():
+        for key, text in items:
+            for chunk in split_at_space(text):
+                yield chunk, key
+
+    current, tokens = None, []
+    for doc, key in nlp.pipe(chunks(), as_tuples=True, batch_size=batch_size, n_process=n_process):
+        if key != current:
+            if current is not None:
+                yield current, tokens
+            current, tokens = key, []
+        tokens.extend(token.text for token in doc if not token.is_punct and not token.is_space)
+
+    if current is not None:
+        yield current, tokens
+
+
+def tokenize_sections(sections, name, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES, exclude=NLP_EXCLUDE):
+    """NLP stage: extract_sections output -> {section title: tokens}, with throughput printed."""
+    start = time.perf_counter()
+    tokenized = dict(iter_tokens(sections.items(), batch_size, n_process, exclude))
+
+    elapsed = time.perf_counter() - start
+    count = sum(len(tokens) for tokens in tokenized.values())
+    print(f"🧠 {name}: {count} tokens in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} tokens/s)")
+    return tokenized
+
+
+def tokenize_corpus(items, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES, exclude=NLP_EXCLUDE):
+    """Same as iter_tokens for a whole corpus of (key, text) pairs, e.g. ((ticker, filing_id, section), text),
+    run outside the worker pool so n_process > 1 can be used. Prints tokens/s every 100 keys and at the end."""
+    start = time.perf_counter()
+    count = 0
+    for done, (key, tokens) in enumerate(iter_tokens(items, batch_size, n_process, exclude), 1):
+        count += len(tokens)
+        if done % 100 == 0:
+            print(f"🧠 {done} sections, {count / (time.perf_counter() - start):,.0f} tokens/s")
+        yield key, tokens
+
+    elapsed = time.perf_counter() - start
+    print(f"🧠 {count} tokens in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} tokens/s)")
+
+
+def extract_sections_by_anchor(filing, name):
+    """Slices sections straight out of the text using the TOC links and the anchor index.
+
+    One lookup per section, no rescan of the document. Returns None when the TOC
+    has no links or none of them point at an anchor we found.
+    """
+    toc = toc_extract.extract_toc_original(filing, name)
+    if not toc:
+        return None
 
-    if not toc_sections:
-        print(f"❌❌ {name}: TOC not found, falling back to full document extraction.")
-        return {"Full Document": soup.get_text()}
+    text, anchors = filing.anchor_index
+    spans = toc_extract.section_spans(toc, anchors, len(text))
+    if not spans:
+        return None
 
-    extracted_sections = {}
-    current_section = None
-    buffer = []
+    return {span["title"]: text[span["start"]:span["end"]].strip() for span in spans}
 
-    for tag in soup.find_all(["h1", "h2", "h3", "h4", "div", "p"]):
-        text = tag.get_text(strip=True)
 
-        # Check if text matches TOC section
-        for section_number, section_title, section_id, _ in toc_sections:
-            if section_title.lower() in text.lower():
-                # Store previous section
-                if current_section:
-                    extracted_sections[current_section] = "\n".join(buffer)
-                # Start new section
-                current_section = section_title
-                buffer = []
-                break
+def extract_sections(html_content,name):
+    """Uses TOC to split the document into sections."""
+    filing = as_filing(html_content, name)
+
+    # Fast path: TOC links resolved to offsets through the anchor index
+    sections = extract_sections_by_anchor(filing, name)
+    if sections:
+        return sections
 
-        buffer.append(text)
+    text = filing.anchor_index[0]
+    toc_sections = find_table_of_contents(filing.html,name)
+    titles = [section_title for _, section_title, _ in toc_sections] if toc_sections else []
+    items = {section_number: section_title for section_number, section_title, _ in toc_sections or []}
 
-    # Save last section
-    if current_section:
-        extracted_sections[current_section] = "\n".join(buffer)
+    # One scan of the text for the TOC titles and the standard 10-K items
+    spans = headings.section_spans(text, titles, items=items)
+    if not spans:
+        print(f"❌❌ {name}: no section headings found, falling back to full document extraction.")
+        return {"Full Document": text}
 
-    return extracted_sections
+    return {span["title"]: text[span["start"]:span["end"]].strip() for span in spans}
 
 
 # def extract_sections(text,name):
 #     """Extracts sections dynamically based on TOC, processing in chunks if needed."""
 #     extracted_text = []
 
+#     nlp = models.get_nlp(exclude=NLP_EXCLUDE)
 #     for chunk in chunk_text(text):
 #         doc = nlp(chunk)  # Process in smaller pieces
 #         clean_text = " ".join([token.text for token in doc if not token.is_punct])
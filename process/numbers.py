@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+# Turns the string cells of extracted 10-K tables into float64 numbers, all of a
+# filing's tables at a time with pandas string ops, no per-cell Python loop.
+
+VERSION = 3
+
+SCALES = [
+    (r"\bin\s+billions\b", 1e9),
+    (r"\bin\s+millions\b", 1e6),
+    (r"\bin\s+thousands\b", 1e3),
+]
+# How many rows from the top count as the header when looking for "(in thousands)"
+HEADER_ROWS = 4
+
+CURRENCY_CELL = r"^[$€£]$"
+CLOSING_CELL = r"^(?:\)|%|\)%|%\))$"  # ")" , "%" or ")%" left over in their own column
+FOOTNOTE_CELL = r"^(?:\([a-z]\)|\*+)$"
+FOOTNOTE_SUFFIX = r"\s*(?:\([a-z]\)|\*+)$"
+# pandas may run these regexes on pyarrow strings, where \s is ASCII only, so the
+# non-breaking and thin spaces common in filings are listed too
+SPACES = r"\s" + "\u00a0\u2009\u202f"
+# Zero written as a dash, checked once "$", "%", parentheses and spaces are gone,
+# so "$—", "$ —", "(—)" and "— —" count too
+DASHES = ["-", "--", "—", "——", "–", "−"]
+DASH_NOISE = rf"[$€£%(){SPACES}]"
+YEAR = r"^(?:19|20)\d\d$"  # column headers like 2008, never scaled
+# "(In thousands, except per share data)": per share rows keep their own units
+EXCEPT_PER_SHARE = rf"except[^)]*per[{SPACES}-]+share"
+PER_SHARE = rf"per[{SPACES}-]+(?:common[{SPACES}]+)?share|\bEPS\b"
+
+
+def _cells(dataframes):
+    """Every cell of every table in one flat Series, plus which table, row and column
+    (numbered across all tables) each one came from."""
+    arrays = [df.fillna("").astype(str).to_numpy(dtype=object) for df in dataframes]
+    shapes = [array.shape for array in arrays]
+    flat = np.concatenate([array.ravel() for array in arrays]) if arrays else np.array([], dtype=object)
+
+    table = np.repeat(np.arange(len(arrays)), [rows * cols for rows, cols in shapes])
+    row = np.concatenate([np.repeat(np.arange(rows), cols) for rows, cols in shapes]) if arrays else np.array([], dtype=int)
+    offsets = np.cumsum([0] + [cols for _, cols in shapes[:-1]])
+    column = np.concatenate([np.tile(np.arange(cols), rows) + offset for (rows, cols), offset in zip(shapes, offsets)]) if arrays else np.array([], dtype=int)
+
+    return pd.Series(flat, dtype=object).str.strip(), table, row, column, shapes
+
+
+def _column_is(text, column, pattern):
+    """Per column (numbered across tables): every non-empty cell matches pattern and there is at least one."""
+    empty = text == ""
+    ok = text.str.match(pattern) | empty
+    return (ok.groupby(column).all() & (~empty).groupby(column).any()).to_numpy()
+
+
+def merge_split_cells(dataframes):
+    """Glues "$" columns onto the number to their right and ")"/"%" columns onto the
+    number to their left, and drops columns that only hold footnote markers.
+
+    The column checks run once over the cells of all tables together.
+    Returns one 2D object array of stripped cell strings per table.
+    """
+    text, _, _, column, shapes = _cells(dataframes)
+    footnote = _column_is(text, column, FOOTNOTE_CELL)
+    currency = _column_is(text, column, CURRENCY_CELL)
+    closing = _column_is(text, column, CLOSING_CELL)
+
+    cells = text.to_numpy(dtype=object)
+    merged_tables = []
+    start = 0
+    first_column = 0
+    for rows, cols in shapes:
+        grid = cells[start:start + rows * cols].reshape(rows, cols) if cols else np.empty((rows, 0), dtype=object)
+        columns = [grid[:, j] for j in range(cols)]
+
+        # Column level decisions only, the cells themselves are concatenated by numpy
+        merged = []
+        carry = None  # "$" column waiting for the number to its right
+        for j, values in enumerate(columns):
+            flag = first_column + j
+            if footnote[flag]:
+                continue
+            if currency[flag] and j + 1 < cols:
+                carry = values if carry is None else carry + values
+                continue
+            if carry is not None:
+                values, carry = carry + values, None
+            if merged and closing[flag]:
+                merged[-1] = merged[-1] + values
+                continue
+            merged.append(values)
+
+        merged_tables.append(np.column_stack(merged) if merged else np.empty((rows, 0), dtype=object))
+        start += rows * cols
+        first_column += cols
+
+    return merged_tables
+
+
+def parse_numbers(cells):
+    """Parses a Series of cell strings. Returns (float64 values, unscaled, failed),
+    where unscaled marks percentages and years that "(in thousands)" must not touch."""
+    text = cells.fillna("").astype(str).str.strip().str.replace(FOOTNOTE_SUFFIX, "", regex=True)
+    empty = text == ""
+    dash = text.str.replace(DASH_NOISE, "", regex=True).isin(DASHES)
+
+    unscaled = text.str.contains("%", regex=False) | text.str.match(YEAR)
+    negative = (text.str.contains("(", regex=False) & text.str.contains(")", regex=False)) | text.str.match(r"^[$€£]?\s*[-−–]")
+
+    digits = text.str.replace(rf"[$€£%,(){SPACES}]", "", regex=True).str.replace(r"^[-−–]", "", regex=True)
+    values = pd.to_numeric(digits, errors="coerce").astype("float64")
+    values = values.where(~negative, -values)
+    values = values.mask(dash, 0.0)
+
+    failed = values.isna() & ~empty
+    return values, unscaled, failed
+
+
+def detect_scales(text, table, row, count):
+    """1e3/1e6/1e9 per table when its header rows say "(in thousands)" etc."""
+    scales = np.ones(count)
+    header = row < HEADER_ROWS
+    # runs thousands, millions, billions, so the largest unit in the header wins
+    for pattern, scale in reversed(SCALES):
+        hit = text[header].str.contains(pattern, case=False, regex=True)
+        scales[np.unique(table[header][hit.to_numpy()])] = scale
+    return scales
+
+
+def detect_per_share(text, table, row, count):
+    """True for the cells of per share rows in tables whose header says "except per share".
+
+    A row is per share when its label says so ("Net income per share", "EPS"), or when
+    it sits under a label-only heading row that does ("Earnings per share:" then
+    "Basic"/"Diluted"), up to the next label-only row.
+    """
+    if not len(text):
+        return np.zeros(0, dtype=bool)
+    header = row < HEADER_ROWS
+    excepted = np.zeros(count, dtype=bool)
+    hit = text[header].str.contains(EXCEPT_PER_SHARE, case=False, regex=True)
+    excepted[np.unique(table[header][hit.to_numpy()])] = True
+
+    # Cells come row by row, the first cell of a row is its label
+    row_start = np.r_[True, (table[1:] != table[:-1]) | (row[1:] != row[:-1])]
+    row_id = np.cumsum(row_start) - 1
+    labels = pd.Series(text.to_numpy(dtype=object)[row_start], dtype=object)
+    row_table = table[row_start]
+    has_values = np.bincount(row_id, weights=((text != "").to_numpy() & ~row_start), minlength=len(labels)) > 0
+
+    per_share = (
+        labels.str.contains(PER_SHARE, case=False, regex=True)
+        & ~labels.str.contains(EXCEPT_PER_SHARE, case=False, regex=True)
+    ).to_numpy(dtype=bool)
+    heading = ~has_values & (labels != "").to_numpy()
+    table_start = np.r_[True, row_table[1:] != row_table[:-1]]
+    block_start = heading | table_start
+    block = np.cumsum(block_start) - 1
+    block_per_share = (per_share & heading)[block_start]
+
+    rows = (per_share | block_per_share[block]) & excepted[row_table]
+    return rows[row_id]
+
+
+def normalize_tables(dataframes):
+    """Normalizes every table of a filing in one go.
+
+    Returns a list of (values, failed) per table: a float64 DataFrame with the parsed
+    numbers (NaN where a cell is empty or not a number) and a bool DataFrame of the
+    same shape that is True where a non-empty cell didn't parse (labels, stray text...).
+    Amounts are scaled by the table's "(in thousands/millions/billions)", percentages and years
+    aren't, nor are per share rows when the header says "except per share".
+    """
+    if not dataframes:
+        return []
+
+    merged = merge_split_cells(dataframes)
+    frames = [pd.DataFrame(grid) for grid in merged]
+
+    # One long Series for all tables, so every step is one vectorized op
+    text, table, row, _, shapes = _cells(frames)
+    values, unscaled, failed = parse_numbers(text)
+    scales = detect_scales(text, table, row, len(frames))[table]
+    unscaled = unscaled | detect_per_share(text, table, row, len(frames))
+    values = values.where(unscaled, values * scales)
+
+    results = []
+    start = 0
+    for rows, cols in shapes:
+        end = start + rows * cols
+        results.append((
+            pd.DataFrame(values.to_numpy(dtype=np.float64)[start:end].reshape(rows, cols)),
+            pd.DataFrame(failed.to_numpy(dtype=bool)[start:end].reshape(rows, cols)),
+        ))
+        start = end
+    return results
+
+
+def normalize_table(df):
+    """normalize_tables for a single table, returns (values, failed)."""
+    return normalize_tables([df])[0]
@@ -0,0 +1,64 @@
+import os
+import signal
+from multiprocessing import Pool
+
+# Default to one worker per core, the stages are CPU bound (bs4/regex/spaCy)
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Set in a worker whose warmup raised. Pool restarts workers whose initializer
+# raises, forever, so the error is kept and handed to the parent with the first job.
+_warmup_error = None
+
+
+class WarmupError(RuntimeError):
+    pass
+
+
+def init_worker(warmup=None):
+    """Runs once in every worker process before it picks up any filings."""
+    global _warmup_error
+    # Ctrl-C is handled by the parent, which tears the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if warmup is not None:
+        try:
+            warmup()
+        except Exception as e:
+            _warmup_error = f"{type(e).__name__}: {e}"
+
+
+def _run_job(task):
+    if _warmup_error is not None:
+        raise WarmupError(f"worker warmup failed: {_warmup_error}")
+    func, args = task
+    return func(*args)
+
+
+def run_jobs(func, jobs, workers=DEFAULT_WORKERS, warmup=None, ordered=False, max_tasks_per_child=None):
+    """Runs func(*job) for every job on a process pool and yields the results.
+
+    Workers pull jobs one at a time from the pool's shared queue, so a slow filing
+    only holds up its own worker. warmup is called once per worker (load spaCy/NLTK
+    models there). With ordered=True results come back in job order, otherwise
+    as soon as they finish.
+
+    warmup runs once in the parent first, so a missing model raises WarmupError
+    here instead of every worker dying on start. A worker that still fails its
+    warmup raises WarmupError out of the first job it gets.
+    """
+    if warmup is not None:
+        try:
+            warmup()
+        except Exception as e:
+            raise WarmupError(f"warmup failed: {type(e).__name__}: {e}") from e
+
+    tasks = ((func, job) for job in jobs)
+
+    with Pool(
+        processes=workers,
+        initializer=init_worker,
+        initargs=(warmup,),
+        maxtasksperchild=max_tasks_per_child,
+    ) as pool:
+        results = pool.imap(_run_job, tasks, chunksize=1) if ordered else pool.imap_unordered(_run_job, tasks, chunksize=1)
+        for result in results:
+            yield result
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import socket
+import hashlib
+from process.atomic import atomic_write
+
+# Splits a run across machines (or processes) with --shard i/N. A filing belongs to
+# shard int(sha1(accession)) % N, so every box picks the same split from the same tree
+# without talking to the others. Each shard writes into its own partition
+#
+#   <output>/shard-002-of-004/...            what the stage writes, plus
+#   <output>/shard-002-of-004/manifest.json  every filing the shard processed, and any error
+#
+# and `--merge N` combines the manifests into <output>/manifest.json, checking that
+# every filing in the input tree was processed exactly once, by the shard it belongs to.
+MANIFEST = "manifest.json"
+
+
+def parse(spec):
+    """"i/N" -> (i, N), i counts from 0."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard wants i/N, like 0/4, not {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"--shard {spec}: i must be between 0 and {count - 1}")
+    return index, count
+
+
+def shard_of(accession, count):
+    # Not hash(), that changes between Python processes
+    return int(hashlib.sha1(accession.encode("utf-8")).hexdigest()[:16], 16) % count
+
+
+def owns(accession, shard):
+    """Whether shard (i, N) processes this accession, None means one unsharded run."""
+    return shard is None or shard_of(accession, shard[1]) == shard[0]
+
+
+def name(shard):
+    return f"shard-{shard[0]:03d}-of-{shard[1]:03d}"
+
+
+def partition_dir(base_dir, shard):
+    return base_dir if shard is None else os.path.join(base_dir, name(shard))
+
+
+def _write_json(path, data):
+    with atomic_write(path) as f:
+        json.dump(data, f, indent=1)
+
+
+def write_manifest(out_dir, shard, results, started=None, **info):
+    """results is [(ticker, filing_id, error or None)] for every filing the shard took on."""
+    _write_json(os.path.join(out_dir, MANIFEST), {
+        "shard": list(shard) if shard else None,
+        "host": socket.gethostname(),
+        "started": started,
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **info,
+        "filings": [{"ticker": ticker, "filing_id": filing_id, "error": error} for ticker, filing_id, error in results],
+    })
+
+
+def merge(base_dir, expected, count):
+    """Combines the manifests of an N-shard run into base_dir/manifest.json.
+
+    expected is every (ticker, filing_id) in the input tree. Prints what's missing,
+    duplicated, failed or processed by the wrong shard, and returns True when nothing is.
+    """
+    expected = set(expected)
+    seen = {}
+    filings, missing_shards, wrong_shard, duplicates, failed = [], [], [], [], []
+
+    for index in range(count):
+        shard = (index, count)
+        path = os.path.join(partition_dir(base_dir, shard), MANIFEST)
+        if not os.path.exists(path):
+            missing_shards.append(name(shard))
+            continue
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        for filing in manifest["filings"]:
+            key = (filing["ticker"], filing["filing_id"])
+            if key in seen:
+                duplicates.append(key)
+            seen[key] = index
+            if shard_of(filing["filing_id"], count) != index:
+                wrong_shard.append(key)
+            if filing["error"]:
+                failed.append(key)
+            filings.append({**filing, "partition": name(shard)})
+
+    missing = sorted(expected - set(seen))
+    unexpected = sorted(set(seen) - expected)
+    ok = not (missing_shards or missing or unexpected or wrong_shard or duplicates or failed)
+
+    _write_json(os.path.join(base_dir, MANIFEST), {
+        "shards": count,
+        "merged": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ok": ok,
+        "missing_shards": missing_shards,
+        "missing": [list(key) for key in missing],
+        "unexpected": [list(key) for key in unexpected],
+        "wrong_shard": [list(key) for key in wrong_shard],
+        "duplicates": [list(key) for key in duplicates],
+        "failed": [list(key) for key in failed],
+        "filings": filings,
+    })
+
+    print(f"🧩 {len(seen)}/{len(expected)} filings from {count - len(missing_shards)}/{count} shards")
+    for label, keys in (("shards without a manifest", missing_shards), ("missing", missing), ("not in the input tree", unexpected),
+                        ("processed by the wrong shard", wrong_shard), ("processed twice", duplicates), ("failed", failed)):
+        if keys:
+            shown = ", ".join(key if isinstance(key, str) else "/".join(key) for key in keys[:10])
+            print(f"❌ {len(keys)} {label}: {shown}{' ...' if len(keys) > 10 else ''}")
+    if ok:
+        print(f"✅ Every filing processed once, manifest in {os.path.join(base_dir, MANIFEST)}")
+    return ok
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Append-only log of LLM results, one JSON line per finished batch:
+#   {"ticker", "filing_id", "chunk", "prompt", "response", "ts"}
+# chunk is the batch's position in the filing, prompt a hash of everything that went
+# into the request. Lines are written as batches finish and fsynced in groups, so a
+# crash loses at most the last few batches, and a rerun skips every batch whose
+# (filing, chunk, prompt) is already logged. assemble() puts a filing back together
+# in chunk order, whatever order the batches finished in.
+SYNC_EVERY = 32  # fsync after this many appends...
+SYNC_SECONDS = 2.0  # ...or when the last fsync is older than this
+
+
+def prompt_hash(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+class ResultLog:
+    """append(ticker, filing_id, chunk, prompt, response), done(), assemble(). Thread-safe."""
+
+    def __init__(self, path, sync_every=SYNC_EVERY, sync_seconds=SYNC_SECONDS):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_seconds = sync_seconds
+        self.lock = threading.Lock()
+        self.results = {}  # (ticker, filing_id) -> {chunk: record}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._load()
+        self.file = open(path, "ab")
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        good = 0  # end of the last complete line
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self.results.setdefault((record["ticker"], record["filing_id"]), {})[record["chunk"]] = record
+                good += len(line)
+        if good < os.path.getsize(self.path):
+            # A crash mid-write left half a line, cut it so new lines don't get glued onto it
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+            print(f"⚠️ {self.path}: dropped a partly written last record")
+
+    def done(self, ticker, filing_id):
+        """{chunk: record} of the batches already logged for a filing."""
+        with self.lock:
+            return dict(self.results.get((ticker, filing_id), {}))
+
+    def get(self, ticker, filing_id, chunk, prompt):
+        """The logged response for this batch, or None if it's missing or was made from a different prompt."""
+        record = self.done(ticker, filing_id).get(chunk)
+        return record["response"] if record is not None and record["prompt"] == prompt else None
+
+    def append(self, ticker, filing_id, chunk, prompt, response):
+        record = {"ticker": ticker, "filing_id": filing_id, "chunk": chunk, "prompt": prompt, "response": response, "ts": time.time()}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            self.file.write(line)  # one write per line, a crash can only tear the last one
+            self.file.flush()
+            self.results.setdefault((ticker, filing_id), {})[chunk] = record
+            self.pending += 1
+            if self.pending >= self.sync_every or time.monotonic() - self.synced >= self.sync_seconds:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    def sync(self):
+        with self.lock:
+            if self.pending:
+                self._sync()
+
+    def assemble(self, ticker, filing_id, chunks=None, separator="\n\n"):
+        """The filing's responses joined in chunk order. With chunks given, only those
+        chunks are used (so leftovers from an older, differently chunked run are ignored)."""
+        logged = self.done(ticker, filing_id)
+        order = sorted(logged) if chunks is None else [chunk for chunk in chunks if chunk in logged]
+        responses = [logged[chunk]["response"] for chunk in order]
+        return "".join(response + separator for response in responses if response)
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
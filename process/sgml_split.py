@@ -0,0 +1,177 @@
+import re
+import mmap
+import codecs
+from contextlib import contextmanager
+from process import detect
+
+# Document types we actually want out of a full-submission.txt.
+# Everything else (EX-10 contracts, GRAPHIC/ZIP/PDF exhibits, XBRL) is skipped
+# without being decoded.
+MAIN_TYPES = ("10-K", "10-K405", "10-KSB", "EX-13")
+
+# Formats (see detect.sniff) with text worth reading. A wanted type filed as a PDF,
+# XBRL instance or uuencoded file (an EX-13 as a PDF, say) is skipped like an exhibit.
+TEXT_FORMATS = ("html", "ixbrl", "text")
+HTML_FORMATS = ("html", "ixbrl")
+
+# The file is memory-mapped and the envelope is found with regex searches on the raw
+# bytes, so skipped documents (uuencoded graphics are most of a filing's size) are
+# never read into Python objects, and only the wanted <TEXT> ranges get decoded.
+# A tag alone on its line. They start with the literal tag so re can jump between
+# candidates quickly, _find_line checks the line start.
+DOCUMENT_START = re.compile(rb"<DOCUMENT>\r*(?=\n|\Z)")
+DOCUMENT_END = re.compile(rb"</DOCUMENT>\r*(?=\n|\Z)")
+TEXT_START = re.compile(rb"<TEXT>\r*(?=\n|\Z)")
+TEXT_END = re.compile(rb"</TEXT>\r*(?=\n|\Z)")
+
+# Envelope header tags that come right after <DOCUMENT>
+HEADER_TAG = re.compile(rb"^<(TYPE|SEQUENCE|FILENAME|DESCRIPTION)>(.*)$")
+NEWLINE = re.compile(rb"\n")
+
+# Older filings are cp1252 (smart quotes as \x92 etc.) or mostly utf-8 with a few stray
+# cp1252 bytes. Bytes that aren't valid in the requested encoding are decoded as cp1252
+# on their own, so one bad byte doesn't cost the filing or turn the rest into mojibake.
+FALLBACK_ENCODING = "cp1252"
+FALLBACK_ERRORS = "sgml_split_fallback"
+
+# iter_chunks hands out about this much decoded text at a time
+CHUNK_BYTES = 1024 * 1024
+
+
+def _fallback(error):
+    return error.object[error.start:error.end].decode(FALLBACK_ENCODING, errors="replace"), error.end
+
+
+codecs.register_error(FALLBACK_ERRORS, _fallback)
+
+
+def decode(data, encoding="utf-8"):
+    """Decodes bytes (or a memoryview slice of the mapped file) with a per-byte cp1252 fallback."""
+    return str(data, encoding, FALLBACK_ERRORS)
+
+
+def _new_document():
+    return {"type": None, "sequence": None, "filename": None, "description": None, "format": None}
+
+
+@contextmanager
+def mapped(file_path):
+    """The file as a read-only memoryview over an mmap (empty files give an empty view)."""
+    with open(file_path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # can't map an empty file
+            yield memoryview(b"")
+            return
+        try:
+            with memoryview(mm) as view:
+                yield view
+        finally:
+            mm.close()
+
+
+def _find_line(pattern, buf, pos):
+    """The next match of pattern that starts a line, or None."""
+    match = pattern.search(buf, pos)
+    while match is not None and match.start() > 0 and buf[match.start() - 1] != 0x0A:
+        match = pattern.search(buf, match.end())
+    return match
+
+
+def scan(buf, types=MAIN_TYPES, encoding="utf-8", formats=None):
+    """Finds the documents in a mapped full-submission file without touching their bodies.
+
+    Yields a dict per document whose <TYPE> is in types and whose format is in formats
+    (None for all), with the header fields, format (see detect.sniff, from the first
+    SNIFF_BYTES only) and start/end, the byte range of its <TEXT> body in buf.
+    Files without an envelope come back as one document with type None.
+    """
+    allowed = None if types is None else {t.upper() for t in types}
+
+    match = _find_line(DOCUMENT_START, buf, 0)
+    if match is None:
+        if len(buf):
+            doc = _new_document()
+            doc.update(format=detect.sniff(bytes(buf[:detect.SNIFF_BYTES])), start=0, end=len(buf))
+            if formats is None or doc["format"] in formats:
+                yield doc
+        return
+
+    while match is not None:
+        header_start = match.end()
+        text = _find_line(TEXT_START, buf, header_start)
+        document_end = _find_line(DOCUMENT_END, buf, header_start)
+        if text is None or (document_end is not None and document_end.start() < text.start()):
+            # A document with no body
+            match = _find_line(DOCUMENT_START, buf, document_end.end()) if document_end is not None else None
+            continue
+
+        doc = _new_document()
+        for line in bytes(buf[header_start:text.start()]).splitlines():
+            tag = HEADER_TAG.match(line.rstrip(b"\r"))
+            if tag:
+                key = tag.group(1).decode("ascii").lower()
+                value = decode(tag.group(2), encoding).strip()
+                doc[key] = int(value) if key == "sequence" and value.isdigit() else value
+
+        # The body is every line between the <TEXT> and </TEXT> lines, a truncated
+        # last document (no </TEXT>) runs to the end of the file
+        start = min(text.end() + 1, len(buf))
+        text_end = _find_line(TEXT_END, buf, start)
+        end = text_end.start() if text_end is not None else len(buf)
+
+        if allowed is None or (doc["type"] or "").upper() in allowed:
+            doc.update(format=detect.sniff(bytes(buf[start:min(end, start + detect.SNIFF_BYTES)])), start=start, end=end)
+            if formats is None or doc["format"] in formats:
+                yield doc
+
+        document_end = _find_line(DOCUMENT_END, buf, end)
+        match = _find_line(DOCUMENT_START, buf, document_end.end() if document_end is not None else end)
+
+
+def iter_documents(file_path, types=MAIN_TYPES, encoding="utf-8", formats=TEXT_FORMATS):
+    """Walks the <SEC-DOCUMENT>/<DOCUMENT>/<TEXT> envelope of a full-submission file
+    and lazily yields every document whose <TYPE> is in types and whose format is in formats.
+
+    Each document is a dict with type, sequence, filename, description, format
+    (see detect.sniff) and text.
+    Pass types=None and formats=None to get every document.
+    Files without an envelope come back as one document with type None.
+    """
+    with mapped(file_path) as buf:
+        for doc in scan(buf, types, encoding, formats):
+            doc["text"] = decode(buf[doc.pop("start"):doc.pop("end")], encoding)
+            yield doc
+
+
+def _ranges(buf, start, end, size):
+    """Splits start:end into pieces of about size bytes that end on a newline."""
+    while start < end:
+        cut = min(start + size, end)
+        if cut < end:
+            newline = NEWLINE.search(buf, cut, end)
+            cut = newline.end() if newline is not None else end
+        yield start, cut
+        start = cut
+
+
+def iter_chunks(file_path, types=MAIN_TYPES, encoding="utf-8", chunk_bytes=CHUNK_BYTES, formats=TEXT_FORMATS):
+    """Yields the decoded bodies of every wanted document in newline-aligned pieces of
+    about chunk_bytes, so a whole document never has to sit in memory as a str.
+    """
+    with mapped(file_path) as buf:
+        for doc in scan(buf, types, encoding, formats):
+            for start, end in _ranges(buf, doc["start"], doc["end"], chunk_bytes):
+                yield decode(buf[start:end], encoding)
+            yield "\n"
+
+
+def read_documents(file_path, types=MAIN_TYPES, separator="\n", formats=TEXT_FORMATS):
+    """Returns the text of every wanted document in a filing joined into one string."""
+    return separator.join(doc["text"] for doc in iter_documents(file_path, types, formats=formats))
+
+
+def document_formats(file_path, types=MAIN_TYPES):
+    """The sniffed format of every wanted document, in filing order, without decoding any bodies."""
+    with mapped(file_path) as buf:
+        return [doc["format"] for doc in scan(buf, types)]
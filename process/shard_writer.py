@@ -0,0 +1,176 @@
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+from process.atomic import atomic_write, fsync_replace
+
+# Output for hundreds of thousands of filings without millions of small files.
+# Records (ticker, filing_id, section, text, toc) go into size-bounded shards:
+#
+#   <out_dir>/part-00000.jsonl.zst     zstd-compressed JSON lines, or
+#   <out_dir>/part-00000.parquet       one Parquet file (zstd) per shard
+#   <out_dir>/manifest.json            the committed shards, in order
+#
+# A shard is written under a .tmp name, fsynced and renamed, and only then added to
+# the manifest (itself replaced atomically). Readers go through the manifest, so they
+# never see half a shard. A filing's records always land in the same shard.
+FORMATS = ("jsonl.zst", "parquet")
+SHARD_BYTES = 128 * 1024 ** 2  # uncompressed text per shard
+ZSTD_LEVEL = 6
+MANIFEST = "manifest.json"
+COLUMNS = ("ticker", "filing_id", "section", "text", "toc")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(out_dir, manifest):
+    with atomic_write(os.path.join(out_dir, MANIFEST)) as f:
+        json.dump(manifest, f, indent=1)
+
+
+class ShardWriter:
+    """add_filing(ticker, filing_id, records) -> records buffered into the current shard.
+
+    Use as a context manager or call close(), which commits the last shard.
+    Reopening a directory continues after its last committed shard and drops
+    anything a crashed run left uncommitted. Thread-safe.
+    """
+
+    def __init__(self, out_dir, fmt="jsonl.zst", shard_bytes=SHARD_BYTES):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown shard format {fmt!r} (have: {', '.join(FORMATS)})")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.shard_bytes = shard_bytes
+        self.lock = threading.Lock()
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.manifest = read_manifest(out_dir) or {"format": fmt, "columns": list(COLUMNS), "shards": []}
+        if self.manifest["format"] != fmt:
+            raise ValueError(f"{out_dir} already holds {self.manifest['format']} shards, not {fmt}")
+        self._drop_uncommitted()
+        self.index = max((shard["index"] for shard in self.manifest["shards"]), default=-1) + 1
+
+        self._open_shard()
+
+    def _drop_uncommitted(self):
+        committed = {shard["file"] for shard in self.manifest["shards"]}
+        for name in os.listdir(self.out_dir):
+            if name.startswith("part-") and name not in committed:
+                os.remove(os.path.join(self.out_dir, name))
+
+    def _name(self):
+        return f"part-{self.index:05d}.{self.fmt}"
+
+    def _open_shard(self):
+        self.filings = []
+        self.records = 0
+        self.size = 0
+        self.tmp_path = os.path.join(self.out_dir, self._name() + ".tmp")
+        if self.fmt == "jsonl.zst":
+            import zstandard  # only needed for this format
+            self.stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(self.tmp_path, "wb"))
+        else:
+            self.rows = []  # pyarrow writes a Parquet file in one go
+
+    def add_filing(self, ticker, filing_id, records):
+        """records are dicts with section, text and toc (missing keys are None)."""
+        rows = [
+            {"ticker": ticker, "filing_id": filing_id, "section": record.get("section"), "text": record.get("text"), "toc": record.get("toc")}
+            for record in records
+        ]
+        with self.lock:
+            for row in rows:
+                if self.fmt == "jsonl.zst":
+                    line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+                    self.stream.write(line)
+                    self.size += len(line)
+                else:
+                    self.rows.append(row)
+                    self.size += len(row["text"] or "") + len(row["toc"] or "")
+            self.records += len(rows)
+            self.filings.append([ticker, filing_id])
+
+            if self.size >= self.shard_bytes:
+                self._commit()
+                self._open_shard()
+
+    def _commit(self):
+        if self.fmt == "jsonl.zst":
+            self.stream.close()  # ends the zstd frame and closes the file
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(column, pa.string()) for column in COLUMNS])
+            pq.write_table(pa.Table.from_pylist(self.rows, schema=schema), self.tmp_path, compression="zstd")
+            self.rows = []
+
+        if not self.filings:
+            os.remove(self.tmp_path)
+            return
+
+        path = os.path.join(self.out_dir, self._name())
+        fsync_replace(self.tmp_path, path)
+        self.manifest["shards"].append({
+            "index": self.index,
+            "file": self._name(),
+            "records": self.records,
+            "text_bytes": self.size,
+            "bytes": os.path.getsize(path),
+            "sha256": _sha256(path),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "filings": self.filings,
+        })
+        write_manifest(self.out_dir, self.manifest)
+        self.index += 1
+
+    def committed(self):
+        """(ticker, filing_id) of every filing in a committed shard."""
+        return {tuple(filing) for shard in self.manifest["shards"] for filing in shard["filings"]}
+
+    def close(self):
+        with self.lock:
+            self._commit()
+        shards = self.manifest["shards"]
+        print(f"📦 {sum(shard['records'] for shard in shards)} records in {len(shards)} {self.fmt} shards under {self.out_dir}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(out_dir, columns=None):
+    """Every record of the committed shards, shard by shard in manifest order."""
+    manifest = read_manifest(out_dir)
+    if manifest is None:
+        return
+    for shard in manifest["shards"]:
+        path = os.path.join(out_dir, shard["file"])
+        if manifest["format"] == "jsonl.zst":
+            import zstandard
+            with open(path, "rb") as f, io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(f), encoding="utf-8") as lines:
+                for line in lines:
+                    record = json.loads(line)
+                    yield record if columns is None else {column: record[column] for column in columns}
+        else:
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(columns=columns):
+                yield from batch.to_pylist()
@@ -0,0 +1,148 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+from process.atomic import atomic_write
+
+# On-disk cache of stage outputs so reruns skip filings that haven't changed.
+# Entries are keyed by stage name + stage version + a hash of the stage input,
+# so bumping a stage's VERSION (or changing the input) recomputes just that stage.
+#
+# Every cached stage module (detect, html_parse, conv_plaintext, toc_extract,
+# handle_tables, numbers, cleanup) has a module-level VERSION that goes into the key.
+# Bump it whenever the stage's output changes for the same input.
+CACHE_DIR = ".stage_cache"
+MAX_BYTES = 5 * 1024 ** 3  # 5 GB, least recently used entries go first
+EVICT_TO = 0.9  # evict down to this fraction of max_bytes, so it doesn't run again on the next put
+
+# Summing the whole table on every put gets slow on a big cache, so each process keeps
+# a running total of what it wrote. Other workers write to the same cache, so the
+# real total is recounted every RECOUNT_EVERY puts (and before evicting).
+RECOUNT_EVERY = 100
+
+
+def digest(data):
+    """sha256 hex digest of a str or bytes."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="surrogatepass")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(file_path):
+    """sha256 hex digest of a file's bytes, read in blocks."""
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class StageCache:
+    """SQLite index + one pickle blob per entry, with size-bounded LRU eviction."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self._conn = None
+        self._pid = None
+        self._total = None  # running size estimate, per process
+        self._puts = 0
+
+    def _db(self):
+        # One connection per process, the pool workers can't share the parent's
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(self.blob_dir, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, stage TEXT, version TEXT, size INTEGER, last_used REAL)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+            self._total = None
+            self._puts = 0
+        return self._conn
+
+    def _blob_path(self, key):
+        return os.path.join(self.blob_dir, key[:2], key + ".pkl")
+
+    def key(self, stage, version, data):
+        return digest(f"{stage}\0{version}\0{digest(data)}")
+
+    def get(self, stage, version, data):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        key = self.key(stage, version, data)
+        db = self._db()
+        row = db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None
+
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # Blob went missing or is half written, forget about it
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            db.commit()
+            return False, None
+
+        db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        db.commit()
+        return True, value
+
+    def put(self, stage, version, data, value):
+        key = self.key(stage, version, data)
+        path = self._blob_path(key)
+
+        # No fsync: a blob lost in a crash is just a miss, get() drops unreadable ones
+        with atomic_write(path, binary=True, fsync=False) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        size = os.path.getsize(path)
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO entries (key, stage, version, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, stage, str(version), size, time.time()),
+        )
+        db.commit()
+
+        self._puts += 1
+        if self._total is None or self._puts % RECOUNT_EVERY == 0:
+            self._total = self.size()
+        else:
+            self._total += size
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def run(self, stage, version, data, compute):
+        """Returns the cached output of a stage for this input, or computes and stores it."""
+        hit, value = self.get(stage, version, data)
+        if hit:
+            return value
+        value = compute()
+        self.put(stage, version, data, value)
+        return value
+
+    def size(self):
+        return self._db().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Drops least recently used entries until the cache is back under EVICT_TO of max_bytes."""
+        db = self._db()
+        total = self.size()
+        self._total = total
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICT_TO
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            try:
+                os.remove(self._blob_path(key))
+            except FileNotFoundError:
+                pass
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        db.commit()
+        self._total = total
@@ -0,0 +1,98 @@
+import re
+
+# Cleaning rules from clean.clean_text, compiled once.
+#
+# The old version ran ~40 re.sub passes one after another, copying the whole
+# document each time. Here the character deletion is one str.translate, the
+# px/pt units and the 146;-149; entities share a regex pass (removing a unit
+# leaves non-word characters on both sides, so it can't make or break another
+# match), and whitespace squeezing is split/join.
+#
+# The style words stay one pass each, in the old order: deleting one can glue
+# another together ("marginfontsizetop" -> "margintop"), so merging them into one
+# alternation gives different output. Each pass is a plain str.replace, skipped
+# when the word isn't there, which is most of them on most filings.
+
+# Everything outside [a-zA-Z0-9.,;?!\s] is dropped
+KEEP_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,;?!")
+
+# Inline style leftovers, in the order the old passes removed them.
+# "nbsp;" goes first since dropping it glues words back together.
+STYLE_LITERALS = [
+    "stylefontsize", "fontsize",
+    "stylemargintop", "margintop",
+    "stylemarginbottom", "marginbottom",
+    "stylelineheight", "lineheight",
+    "styleborderbottom", "borderbottom",
+    "textindent",
+    "stylealigncenter", "aligncenter",
+    "stylealignleft", "alignleft",
+    "stylealignright", "alignright",
+    "times",
+    "stylefont face", "font face",
+    "times new roman",
+]
+
+# Numeric character references that lost their "&#"
+ENTITIES = {"146;": "'", "147;": '"', "148;": '"', "149;": "-"}
+
+TAG = re.compile(r'<.*?>')
+FONT_SIZE = re.compile(r'size\d')
+UNITS_AND_ENTITIES = re.compile(r"\b\d+p[xt]\b|14[6-9];")
+SEMICOLONS = str.maketrans(";", ".")
+
+# The dot rules feed into each other, and each one is already a cheap scan,
+# so they stay as separate passes
+FLOATING_P = re.compile(r'\sp\s\.')
+SPACE_DOT = re.compile(r'\s+\.')
+DOTS = re.compile(r'\.\.+')
+
+PRIVACY_BLOCK = re.compile(r'begin privacyenhanced message.*?dkhtm', re.DOTALL)  # SEC metadata blocks
+HEADER_LINES = re.compile(r'(?:accession number|standard industrial classification|file number).*?\n')
+
+
+class _KeepTable(dict):
+    """str.translate table that deletes anything we don't keep, filled in lazily per character."""
+
+    def __missing__(self, code):
+        char = chr(code)
+        value = code if char in KEEP_CHARS or char.isspace() else None
+        self[code] = value
+        return value
+
+
+KEEP = _KeepTable()
+
+
+def _replace_unit_or_entity(match):
+    return ENTITIES.get(match.group(), "")
+
+
+def _squeeze_whitespace(text):
+    # Same as re.sub(r'\s+', ' ', text), but split/join is much faster
+    if not text:
+        return text
+    squeezed = " ".join(text.split())
+    if text[0].isspace():
+        squeezed = " " + squeezed
+    if text[-1].isspace() and squeezed != " ":
+        squeezed += " "
+    return squeezed
+
+
+def clean(text):
+    """Cleans 10-K text by removing unwanted characters, metadata and formatting noise."""
+    text = TAG.sub(' ', text.lower())
+    text = text.translate(KEEP).replace("nbsp;", "")
+    for word in STYLE_LITERALS:
+        if word in text:
+            text = text.replace(word, "")
+    text = FONT_SIZE.sub('', text)
+    text = UNITS_AND_ENTITIES.sub(_replace_unit_or_entity, text)
+    text = text.translate(SEMICOLONS)
+    text = FLOATING_P.sub('', text)
+    text = SPACE_DOT.sub('.', text)
+    text = DOTS.sub('.', text)
+    text = PRIVACY_BLOCK.sub('', text)
+    text = HEADER_LINES.sub('', text)
+    return _squeeze_whitespace(text)
@@ -1,7 +1,10 @@
-from bs4 import BeautifulSoup
 import os
 import json
 import re
+from process import sgml_split
+from process.document import as_filing
+
+VERSION = 2
 
 def list_all_files(directory):
     """Lists all files in the given directory."""
@@ -22,16 +25,12 @@ def detect_file_type(file_path):
 
 def extract_toc_original(html_content, name):
     """First attempt: Extract TOC using the original method."""
-    soup = BeautifulSoup(html_content, "lxml")
+    filing = as_filing(html_content, name)
 
     output_dir = "tocs"
     os.makedirs(output_dir, exist_ok=True)
 
-    toc_table = None
-    for table in soup.find_all("table"):
-        if "TABLE OF CONTENTS" in table.get_text():
-            toc_table = table
-            break
+    toc_table = filing.toc_candidates[0] if filing.toc_candidates else None
 
     if not toc_table:
         print(f"❌ {name}: TOC not found using original method.")
@@ -43,7 +42,7 @@ def extract_toc_original(html_content, name):
         if len(columns) < 2:
             continue  # Skip malformed rows
 
-        section_link = columns[0].find("a")
+        section_link = columns[0].find("a", href=True)  # skip name-only anchors like <a name="toc71478_2">
         section_title = section_link.get_text(strip=True) if section_link else columns[0].get_text(strip=True)
         section_id = section_link["href"] if section_link else None
 
@@ -59,13 +58,13 @@ def extract_toc_original(html_content, name):
 
 def extract_toc_refined(html_content, name):
     """Fallback method: Extract TOC using the refined method."""
-    soup = BeautifulSoup(html_content, "html.parser")
+    filing = as_filing(html_content, name)
 
     output_dir = "tocs"
     os.makedirs(output_dir, exist_ok=True)
 
     debug_file = f"debug_toc_{name}.txt"
-    tables = soup.find_all("table")
+    tables = filing.tables
 
     toc_table = None
     for table in tables:
@@ -118,6 +117,38 @@ def extract_toc_refined(html_content, name):
     print(f"✅ {name}: TOC extracted using refined method and saved to {output_file}")
     return toc_entries
 
+def anchor_target(href):
+    """"#item1a" or "d10k.htm#item1a" -> "item1a", None for links that aren't in-page."""
+    if not href or "#" not in href:
+        return None
+    return href.rsplit("#", 1)[1].strip() or None
+
+def section_spans(sections, anchors, length):
+    """Resolves TOC entries to [start, end) spans of the extracted text through the anchor index.
+
+    sections are extract_toc_original's {"title", "id"} dicts and anchors comes from
+    ParsedFiling.anchor_index. Each span ends where the next resolved section starts.
+    Entries whose anchor is missing are left out, so an empty list means "fall back".
+    """
+    starts = []
+    for section in sections or []:
+        target = anchor_target(section.get("id"))
+        if target is None:
+            continue
+        offset = anchors.get(target)
+        if offset is None:
+            offset = anchors.get(target.lower())
+        if offset is not None:
+            starts.append((offset, section["title"]))
+
+    starts.sort()
+    spans = []
+    for i, (start, title) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else length
+        if end > start:
+            spans.append({"title": title, "start": start, "end": end})
+    return spans
+
 def process_10k_files(directory):
     """Processes all 10-K files in a directory."""
     list_all_files(directory)
@@ -127,15 +158,14 @@ def process_10k_files(directory):
         file_type = detect_file_type(file_path)
 
         if file_type == "html":
-            with open(file_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
+            filing = as_filing(sgml_split.read_documents(file_path), file_name)  # parsed once for both methods
 
-            sections = extract_toc_original(html_content, file_name)
+            sections = extract_toc_original(filing, file_name)
             if sections:
                 continue  # ✅ Use original method if successful
 
             print(f"🔄 Falling back to refined method for {file_name}...")
-            extract_toc_refined(html_content, file_name)
+            extract_toc_refined(filing, file_name)
 
         elif file_type == "text":
             print(f"⚠ {file_name}: This appears to be plain text, not HTML. Consider converting it.")
@@ -145,10 +175,11 @@ def process_10k_files(directory):
 
 def find_table_of_contents(html_content, name):
     """Runs the original method first, then falls back to the refined method if needed."""
-    sections = extract_toc_original(html_content, name)
+    filing = as_filing(html_content, name)  # both methods share one parse
+    sections = extract_toc_original(filing, name)
     
     if sections:
         return sections  # ✅ Use original method if successful
 
     print(f"🔄 Falling back to refined method for {name}...")
-    return extract_toc_refined(html_content, name)
+    return extract_toc_refined(filing, name)
@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import numpy as np
+
+# Tokenized dataset store for the ML side: token IDs as uint32 in big append-only
+# shard files, plus a SQLite index of (ticker, filing_id, section) -> (shard, offset, length).
+# Readers memory-map the shards and get any section as a zero-copy slice, no text parsing.
+#
+#   store_dir/
+#       index.sqlite         sections + vocab
+#       shard_00000.bin      raw uint32 token IDs, little endian
+#       shard_00001.bin ...
+#
+# One writer at a time. Each filing is stored with a source key (e.g. a hash of its
+# text), and add_sections skips a filing whose key hasn't changed, so reruns don't
+# append the same tokens again. A changed filing replaces its sections, and the old
+# tokens stay in their shard as dead space.
+STORE_DIR = "token_store"
+DTYPE = np.dtype("<u4")
+SHARD_TOKENS = 256 * 1024 ** 2  # 1 GB of uint32s per shard
+
+
+def _connect(store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(store_dir, "index.sqlite"), timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sections ("
+        "ticker TEXT, filing_id TEXT, section TEXT, shard INTEGER, offset INTEGER, length INTEGER, "
+        "PRIMARY KEY (ticker, filing_id, section))"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS vocab (id INTEGER PRIMARY KEY, token TEXT UNIQUE)")
+    conn.execute("CREATE TABLE IF NOT EXISTS filings (ticker TEXT, filing_id TEXT, source TEXT, PRIMARY KEY (ticker, filing_id))")
+    conn.commit()
+    return conn
+
+
+def shard_path(store_dir, shard):
+    return os.path.join(store_dir, f"shard_{shard:05d}.bin")
+
+
+class TokenStoreWriter:
+    """Appends sections to the store. Token strings get IDs from the store's vocab
+    (new ones are added as they show up), lists/arrays of ints are stored as is."""
+
+    def __init__(self, store_dir=STORE_DIR, shard_tokens=SHARD_TOKENS):
+        self.store_dir = store_dir
+        self.shard_tokens = shard_tokens
+        self.conn = _connect(store_dir)
+        self.vocab = dict(self.conn.execute("SELECT token, id FROM vocab"))
+        self.new_tokens = []
+
+        last = self.conn.execute("SELECT MAX(shard) FROM sections").fetchone()[0]
+        self.shard = last or 0
+        self.file = None
+        self._open_shard()
+
+    def _open_shard(self):
+        if self.file:
+            self.file.close()
+        self.file = open(shard_path(self.store_dir, self.shard), "ab")
+        self.used = self.file.tell() // DTYPE.itemsize
+
+    def encode(self, tokens):
+        """Token strings -> uint32 IDs, growing the vocab."""
+        ids = np.empty(len(tokens), dtype=DTYPE)
+        for i, token in enumerate(tokens):
+            token_id = self.vocab.get(token)
+            if token_id is None:
+                token_id = self.vocab[token] = len(self.vocab)
+                self.new_tokens.append((token_id, token))
+            ids[i] = token_id
+        return ids
+
+    def add(self, ticker, filing_id, section, tokens):
+        if len(tokens) and isinstance(tokens[0], str):
+            ids = self.encode(tokens)
+        else:
+            ids = np.asarray(tokens, dtype=DTYPE)
+
+        # A section never straddles two shards
+        if self.used and self.used + len(ids) > self.shard_tokens:
+            self.shard += 1
+            self._open_shard()
+
+        offset = self.used
+        self.file.write(ids.tobytes())
+        self.used += len(ids)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sections (ticker, filing_id, section, shard, offset, length) VALUES (?, ?, ?, ?, ?, ?)",
+            (ticker, filing_id, section, self.shard, offset, len(ids)),
+        )
+
+    def has_filing(self, ticker, filing_id, source):
+        """Whether the filing is stored from this same source key."""
+        row = self.conn.execute("SELECT source FROM filings WHERE ticker = ? AND filing_id = ?", (ticker, filing_id)).fetchone()
+        return row is not None and row[0] == source
+
+    def add_sections(self, ticker, filing_id, sections, source=None):
+        """Adds a {section: tokens} dict, e.g. nlp_extract.tokenize_sections output, and commits.
+
+        With a source key (anything that changes when the tokens would), a filing already
+        stored from the same source is skipped. Returns whether anything was written.
+        """
+        if source is not None:
+            if self.has_filing(ticker, filing_id, source):
+                return False
+            # Sections the new version doesn't have anymore shouldn't linger in the index
+            self.conn.execute("DELETE FROM sections WHERE ticker = ? AND filing_id = ?", (ticker, filing_id))
+        for section, tokens in sections.items():
+            self.add(ticker, filing_id, section, tokens)
+        if source is not None:
+            self.conn.execute("INSERT OR REPLACE INTO filings (ticker, filing_id, source) VALUES (?, ?, ?)", (ticker, filing_id, source))
+        self.commit()
+        return True
+
+    def commit(self):
+        """Makes everything added so far durable: shard bytes first, then the index pointing at them."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if self.new_tokens:
+            self.conn.executemany("INSERT INTO vocab (id, token) VALUES (?, ?)", self.new_tokens)
+            self.new_tokens = []
+        self.conn.commit()
+
+    def close(self):
+        self.commit()
+        self.file.close()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TokenStore:
+    """Read side: get(ticker, filing_id, section) is a zero-copy uint32 view into a memory-mapped shard."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.conn = _connect(store_dir)
+        self.maps = {}
+        self._tokens = None
+
+    def _map(self, shard, end):
+        array = self.maps.get(shard)
+        if array is None or len(array) < end:
+            # (Re)map, the shard may have grown since we first opened it
+            array = self.maps[shard] = np.memmap(shard_path(self.store_dir, shard), dtype=DTYPE, mode="r")
+        return array
+
+    def locate(self, ticker, filing_id, section):
+        """(shard, offset, length) or None."""
+        return self.conn.execute(
+            "SELECT shard, offset, length FROM sections WHERE ticker = ? AND filing_id = ? AND section = ?",
+            (ticker, filing_id, section),
+        ).fetchone()
+
+    def get(self, ticker, filing_id, section):
+        location = self.locate(ticker, filing_id, section)
+        if location is None:
+            raise KeyError((ticker, filing_id, section))
+        shard, offset, length = location
+        return self._map(shard, offset + length)[offset:offset + length]
+
+    def keys(self, ticker=None, filing_id=None):
+        """(ticker, filing_id, section) for every stored section, optionally for one ticker/filing."""
+        query = "SELECT ticker, filing_id, section FROM sections WHERE (? IS NULL OR ticker = ?) AND (? IS NULL OR filing_id = ?)"
+        return self.conn.execute(query + " ORDER BY ticker, filing_id, rowid", (ticker, ticker, filing_id, filing_id)).fetchall()
+
+    def decode(self, ids):
+        """IDs back to token strings, for debugging."""
+        if self._tokens is None:
+            self._tokens = dict(self.conn.execute("SELECT id, token FROM vocab"))
+        return [self._tokens[int(i)] for i in ids]
+
+    def close(self):
+        self.maps = {}
+        self.conn.close()
@@ -1,5 +1,6 @@
 #! /bin/bash
 pip install spacy nltk tqdm
-python -m spacy download en_core_web_sm python-magic beautifulsoup4 pandas lxml
+python -m spacy download en_core_web_sm beautifulsoup4 pandas lxml
 python -c "import nltk; nltk.download('punkt')"
-python -c "import nltk; nltk.download('punkt_tab')"
\ No newline at end of file
+python -c "import nltk; nltk.download('punkt_tab')"
+python -c "import nltk; nltk.download('stopwords')"
\ No newline at end of file
@@ -0,0 +1,69 @@
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local stand-in for the OpenAI /chat/completions endpoint, to try the LLM client
+# and its rate limiting without spending anything:
+#
+#   python stub_llm_server.py [port] [limit_every] [delay_seconds]
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python gpt_process.py
+#
+# Every limit_every-th request gets a 429 with Retry-After: 1 (0 = never).
+PORT = 8089
+LIMIT_EVERY = 5
+DELAY = 0.2
+
+count = 0
+count_lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        global count
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with count_lock:
+            count += 1
+            n = count
+
+        if LIMIT_EVERY and n % LIMIT_EVERY == 0:
+            self._send(429, {"error": {"message": "rate limited (stub)"}}, {"Retry-After": "1"})
+            return
+
+        time.sleep(DELAY)
+        prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        reply = f"stub reply to {len(prompt)} chars"
+        self._send(200, {
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 5, "total_tokens": prompt_tokens + 5},
+        })
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet
+
+
+def serve(port=PORT):
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"🧪 Stub LLM server on http://127.0.0.1:{port}/v1 (429 every {LIMIT_EVERY or 'never'})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        LIMIT_EVERY = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        DELAY = float(sys.argv[3])
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
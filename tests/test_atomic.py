@@ -0,0 +1,17 @@
+import os
+import pytest
+from process.atomic import atomic_write
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / "out" / "manifest.json")
+    with atomic_write(path) as f:
+        f.write("old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write("half of the new")
+            raise RuntimeError("crash")
+
+    assert open(path).read() == "old"
+    assert os.listdir(tmp_path / "out") == ["manifest.json"]  # no temp file left behind
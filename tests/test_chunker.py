@@ -0,0 +1,23 @@
+import random
+from process import chunker
+
+
+def test_flattened_table_chunks_stay_under_the_cap():
+    # One giant "sentence" of short words, where per-word counts undercount the joined text
+    rng = random.Random(1)
+    text = " ".join(rng.choice(["1,234", "$", "(5)", "revenue", "net", "—", "income", "2008", "%"]) for _ in range(20000))
+    for cap in (50, 200, 1000):
+        chunks = chunker.split_text(text, cap)
+        assert max(chunker.estimate_tokens(chunk) for chunk in chunks) <= cap
+        assert " ".join(chunks).split() == text.split()
+
+
+def test_paragraphs_stay_under_the_cap():
+    rng = random.Random(2)
+    sentences = ["Sales rose.", "Costs fell sharply.", "We a b c d.", "Net income was 5.", "Item 7 overview of results."]
+    for _ in range(200):
+        text = "\n\n".join(" ".join(rng.choice(sentences) for _ in range(rng.randint(1, 60))) for _ in range(rng.randint(1, 20)))
+        cap = rng.randint(5, 300)
+        chunks = chunker.split_text(text, cap)
+        assert max(chunker.estimate_tokens(chunk) for chunk in chunks) <= cap
+        assert " ".join(chunks).split() == text.split()
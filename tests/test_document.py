@@ -0,0 +1,16 @@
+from process import document
+
+HTML = (
+    '<html><head><style>p {margin: 0}</style></head><body>'
+    '<p>Table of contents</p><a name="item1"></a><p>Item 1. <b>Business</b></p>'
+    '<div id="item1a"><p>Item 1A. Risk Factors</p></div><a name="end"></a></body></html>'
+)
+
+
+def test_anchor_offsets_index_filing_text():
+    filing = document.ParsedFiling(HTML)
+    text, anchors = filing.anchor_index
+    assert text is filing.text
+    assert text[anchors["item1"]:].startswith("Item 1.  Business")  # get_text puts a space between every string
+    assert text[anchors["item1a"]:].startswith("Item 1A. Risk Factors")
+    assert anchors["end"] == len(text)
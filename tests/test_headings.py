@@ -0,0 +1,30 @@
+from process import headings
+
+TOC = "".join(f"Item {number}. {title} \n 1{number} \n" for number, title in [
+    ("1", "Business"),
+    ("1A", "Risk Factors"),
+    ("3", "Legal Proceedings"),
+    ("4", "Submission of Matters to a Vote of Security Holders"),
+    ("5", "Market for Registrant's Common Equity"),
+])
+BODY = (
+    " ITEM 1. \n BUSINESS \n" + "We sell water. " * 40 + "\n"
+    " ITEM 1A. \n RISK FACTORS \n" + "Pipes break. " * 40 + "\n"
+    " ITEM 3. \n LEGAL PROCEEDINGS    None. \n" + "Filler. " * 40 + "\n"
+    " ITEM 4. \n SUBMISSION OF MATTERS TO A VOTE OF SECURITY HOLDERS    None \n 40 \n"
+    " ITEM 5. \n" + "Our stock trades on the NYSE. " * 20 + "\n"
+)
+
+
+def test_pre_2011_item_4_keeps_its_own_title():
+    text = "Table of Contents \n" + TOC + "\n PART I \n" + BODY
+    spans = headings.section_spans(text)
+    toc_end = len("Table of Contents \n" + TOC)
+    assert all(span["start"] > toc_end for span in spans)  # nothing starts inside the TOC
+
+    titles = [span["title"] for span in spans]
+    assert "Mine Safety Disclosures" not in titles
+    assert titles[:4] == ["Business", "Risk Factors", "Legal Proceedings", "Submission of Matters to a Vote of Security Holders"]
+    item_4 = spans[3]
+    assert text[item_4["start"]:item_4["end"]].strip().startswith("ITEM 4.")
+    assert len(titles) == len(set(titles)) == 5
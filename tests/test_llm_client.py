@@ -0,0 +1,57 @@
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+import stub_llm_server
+from process.llm_client import LLMClient
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """stub_llm_server on a free port, answering right away and never rate limiting unless a test says so."""
+    monkeypatch.setattr(stub_llm_server, "DELAY", 0)
+    monkeypatch.setattr(stub_llm_server, "LIMIT_EVERY", 0)
+    monkeypatch.setattr(stub_llm_server, "count", 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub_llm_server.Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def _run(base_url, requests, content="hello", max_tokens=None, **limits):
+    """Sends the requests at once through one client, returns (replies, stats, seconds)."""
+    async def go():
+        async with LLMClient("stub", api_key="", base_url=base_url, **limits) as client:
+            started = time.monotonic()
+            replies = await asyncio.gather(*(
+                client.chat([{"role": "user", "content": content}], max_tokens=max_tokens) for _ in range(requests)
+            ))
+            return replies, client.stats, time.monotonic() - started
+    return asyncio.run(go())
+
+
+def test_429_waits_for_retry_after(stub, monkeypatch):
+    monkeypatch.setattr(stub_llm_server, "LIMIT_EVERY", 2)
+    monkeypatch.setattr(stub_llm_server, "count", 1)  # the first request gets the 429, Retry-After: 1
+    replies, stats, elapsed = _run(stub, 1)
+    assert replies == ["stub reply to 5 chars"]
+    assert stats["rate_limited"] == 1 and stats["retries"] == 1 and stats["requests"] == 2
+    assert elapsed >= 0.95
+
+
+def test_rpm_cap(stub):
+    # A full bucket of 30 goes at once, after that one request every 2 seconds
+    replies, stats, elapsed = _run(stub, 32, rpm=30, tpm=10**9)
+    assert all(replies) and stats["requests"] == 32
+    assert elapsed >= 3.6  # uncapped, 32 requests take well under a second
+
+
+def test_tpm_cap(stub):
+    # 95 prompt tokens + 5 reserved for the answer = 100 per request, the stub reports the same usage,
+    # so 30 go out of the full bucket and then one every 2 seconds
+    replies, stats, elapsed = _run(stub, 32, content="x" * 380, max_tokens=5, rpm=10**9, tpm=3000)
+    assert all(replies) and stats["tokens"] == 32 * 100
+    assert elapsed >= 3.6
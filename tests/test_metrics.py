@@ -0,0 +1,16 @@
+import json
+import pytest
+from process import metrics
+
+
+def test_base_exception_reaches_the_caller(tmp_path):
+    path = tmp_path / "stages.jsonl"
+    stages = metrics.FilingMetrics("AAA", "0000000001-21-000001", path=str(path))
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        stages.run("html_parse", interrupted, bytes_in=10)
+    row = json.loads(path.read_text().splitlines()[-1])
+    assert row["stage"] == "html_parse"
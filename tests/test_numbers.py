@@ -0,0 +1,45 @@
+import pandas as pd
+from process import numbers
+
+
+def test_dash_zeros():
+    cells = pd.Series(["—", "$—", "$ —", "$ —", "(—)", "— —", "-", "$ -", "–%", "1,234", "(5)", "n/a", ""])
+    values, _, failed = numbers.parse_numbers(cells)
+    assert values.tolist()[:9] == [0.0] * 9
+    assert values.tolist()[9:11] == [1234.0, -5.0]
+    assert failed.tolist() == [False] * 11 + [True, False]
+
+
+def test_currency_column_merged_with_dash():
+    # "$" in its own column gets glued onto the dash next to it
+    df = pd.DataFrame([["(in thousands)", "", ""], ["Revenue", "$", "—"], ["Costs", "$", "1,200"]])
+    values, failed = numbers.normalize_table(df)
+    assert values.iloc[1, 1] == 0.0 and not failed.iloc[1, 1]
+    assert values.iloc[2, 1] == 1_200_000.0
+
+
+def test_except_per_share_rows_not_scaled():
+    df = pd.DataFrame([
+        ["(In thousands, except per share data)", "", ""],
+        ["", "2009", "2008"],
+        ["Net income", "2,500", "2,000"],
+        ["Net income per share", "1.25", "1.00"],
+        ["Earnings per share:", "", ""],
+        ["Basic", "1.25", "1.00"],
+        ["Diluted", "1.20", "0.98"],
+        ["Weighted average shares:", "", ""],
+        ["Basic", "2,000", "2,000"],
+    ])
+    values, _ = numbers.normalize_table(df)
+    assert values.iloc[1].tolist()[1:] == [2009.0, 2008.0]
+    assert values.iloc[2, 1] == 2_500_000.0
+    assert values.iloc[3, 1] == 1.25
+    assert values.iloc[5].tolist()[1:] == [1.25, 1.0]
+    assert values.iloc[6, 1] == 1.2
+    assert values.iloc[8, 1] == 2_000_000.0
+
+
+def test_per_share_rows_scaled_without_except_clause():
+    df = pd.DataFrame([["(in thousands)", ""], ["Dividends per share", "1"]])
+    values, _ = numbers.normalize_table(df)
+    assert values.iloc[1, 1] == 1_000.0
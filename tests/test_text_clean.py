@@ -0,0 +1,87 @@
+import os
+import random
+from process import text_clean
+from tests.clean_reference import chop_off_graphics, clean_reference
+
+# text_clean.clean() has to give exactly what the old pass-by-pass clean_text
+# (kept unchanged in tests/clean_reference.py) gave. The reference still cuts
+# off everything after GRAPHIC, which sgml_split does now, so clean() is compared
+# on chop_off_graphics(text).
+
+
+def check(text):
+    assert text_clean.clean(chop_off_graphics(text)) == clean_reference(text), repr(text)
+
+
+def test_style_words_that_glue_into_another():
+    # Deleting one style word can create an earlier one in the list
+    assert text_clean.clean("marginfontsizetop") == clean_reference("marginfontsizetop") == ""
+    assert text_clean.clean("x alignfontsizeleft y") == clean_reference("x alignfontsizeleft y") == "x y"
+    for text in [
+        "fontfontsizesize",
+        "stylestylefontsizefontsize",
+        "marginmargintoptop",
+        "linelineheightheight",
+        "alignaligncentercenter",
+        "timtimeses new roman",
+        "times new roman",
+        "stylefont facesize3",
+        "fontsizesize4 10pt",
+        "stylefontsize10pt",
+        "border<b>bottom</b> textind&ent",
+        "text&nbsp;indent",
+        "size&nbsp;2",
+    ]:
+        check(text)
+
+
+def test_units_and_entities():
+    for text in [
+        "10px 12pt 3px4pt",
+        "a 5px10pt b",
+        "146; 147;148; 149;",
+        "1146; 146;5px 14px6;",
+        "width 100px; height 20pt;",
+        "10 pt 10p x",
+    ]:
+        check(text)
+
+
+def test_dots_and_metadata():
+    for text in [
+        "end p . next",
+        "a ;; b .. c ... d",
+        "a\n\n.\n b",
+        "begin privacyenhanced message junk dkhtm kept",
+        "ACCESSION NUMBER: 0000066740-03-000005\nkept\nfile number 1-234\n",
+        "standard industrial classification",
+        "",
+        "   ",
+        " \n a \t",
+    ]:
+        check(text)
+
+
+def test_graphics_are_cut_like_before():
+    check("<TEXT>keep this</TEXT>\nGRAPHIC\nbegin 644 logo.jpg\nM_junk\n")
+
+
+def test_fuzzed_from_rule_literals():
+    # Random strings built out of the pieces the rules look for, so they overlap
+    # and glue together in every order
+    pieces = text_clean.STYLE_LITERALS + [
+        "style", "font", "size", "margin", "top", "bottom", "line", "height", "border",
+        "text", "indent", "align", "center", "left", "right", "tim", "es", " new roman",
+        "nbsp;", "&", "<p>", "<", ">", "1", "4", "6", "9", "14", "px", "pt", "p", ";", ".",
+        " ", "\n", "\t", "\xa0", "é", "İ", "GRAPHIC", "dkhtm", "begin privacyenhanced message",
+        "accession number", "file number", "A", "B",
+    ]
+    rng = random.Random(42)
+    for _ in range(20000):
+        check("".join(rng.choice(pieces) for _ in range(rng.randint(0, 12))))
+
+
+def test_awk_sample():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "target_sample_AWK_040650.txt")
+    with open(path, encoding="utf-8", errors="replace") as f:
+        check(f.read())
@@ -0,0 +1,15 @@
+from process import toc_extract
+
+HTML = (
+    '<html><body><table><tr><td>TABLE OF CONTENTS</td><td>Page</td></tr>'
+    '<tr><td><a name="toc71478_2"></a>Item 1. Business</td><td>4</td></tr>'
+    '<tr><td><a href="#item1a">Item 1A. Risk Factors</a></td><td>9</td></tr>'
+    '</table></body></html>'
+)
+
+
+def test_name_only_anchors_in_toc_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # it writes tocs/<name>.json
+    sections = toc_extract.extract_toc_original(HTML, "sample")
+    assert {"title": "Item 1. Business", "id": None} in sections
+    assert {"title": "Item 1A. Risk Factors", "id": "#item1a"} in sections